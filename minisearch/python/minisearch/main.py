@@ -5,6 +5,8 @@ from contextlib import contextmanager
 
 
 class Index:
+    __slots__ = ("_search_rs",)
+
     def __init__(self, dir: str, conf: str | None = None) -> None:
         """
         Create or load an index stored in "dir"
@@ -45,6 +47,15 @@ class Index:
         """
         return self._search_rs.add(document)
 
+    def add_many(self, documents: list[str]) -> list[str]:
+        """
+        Add documents and return their ULID strings in the same order
+
+        Raises:
+            IndexAddError: add operation failed
+        """
+        return self._search_rs.add_many(documents)
+
     def delete(self, id: str) -> bool:
         """
         Mark a document deleted
@@ -63,6 +74,15 @@ class Index:
         """
         return self._search_rs.search(query, top_k)
 
+    def search_many(self, queries: list[str], top_k: int = 0) -> list[list[Result]]:
+        """
+        Search the index for each query and return scored results per query
+
+        Raises:
+            SearchQueryError: invalid query syntax
+        """
+        return self._search_rs.search_many(queries, top_k)
+
     def flush(self) -> None:
         """
         Persist all buffered changes
@@ -83,6 +103,7 @@ class Index:
 
 
 class MiniSearch:
+    __slots__ = ("_conf", "_indexes")
 
     def __init__(self, conf: str | None = None):
         """Create an in-memory registry of indexes"""
@@ -96,16 +117,16 @@ class MiniSearch:
         Raises:
             IndexInitError: load/create index state failed
         """
-        if index not in self._indexes:
-            self._indexes[index] = Index(dir, conf or self._conf)
-            return (True, self._indexes[index])
+        handle = self._indexes.get(index)
+        if handle is None:
+            handle = self._indexes[index] = Index(dir, conf or self._conf)
+            return (True, handle)
 
-        return (False, self._indexes[index])
+        return (False, handle)
 
     def delete(self, index: str) -> None:
         """Remove an index handle from the registry"""
-        if index in self._indexes:
-            del self._indexes[index]
+        self._indexes.pop(index, None)
 
     def has_index(self, index: str) -> bool:
         """Return True if the index handle exists"""
@@ -1,111 +1,152 @@
-use std::collections::HashMap;
-
-static VOWELS: [char; 6] = ['a', 'e', 'i', 'o', 'u', 'y'];
+// bitmask of vowels 'a', 'e', 'i', 'o', 'u', 'y' indexed by letter offset from 'a'
+const VOWELS_MASK: u32 = 1 << 0 | 1 << 4 | 1 << 8 | 1 << 14 | 1 << 20 | 1 << 24;
+// bitmask of letters 'a', 'e', 'i', 'o', 'u', 'w', 'x' which can't end short syllabe
+const SHORT_SYLLABE_BLOCKERS_MASK: u32 =
+    1 << 0 | 1 << 4 | 1 << 8 | 1 << 14 | 1 << 20 | 1 << 22 | 1 << 23;
 static DOUBLES: [&str; 9] = ["bb", "dd", "ff", "gg", "mm", "nn", "pp", "rr", "tt"];
-static LI_ENDINGS: [char; 10] = ['c', 'd', 'e', 'g', 'h', 'k', 'm', 'n', 'r', 't'];
-static EXCEPTION_WORDS: [&str; 7] = ["sky", "news", "howe", "atlas", "cosmos", "bias", "andes"];
-static R1_BEGININGS: [&str; 8] = [
-    "gener", "commun", "arsen", "past", "univers", "later", "emerg", "organ",
-];
+static LI_ENDINGS: [u8; 10] = [b'c', b'd', b'e', b'g', b'h', b'k', b'm', b'n', b'r', b't'];
 
 static STEP_1A_SUFFIXES: [&str; 6] = ["sses", "ied", "ies", "us", "ss", "s"];
 static STEP_1B_SUFFIXES_1: [&str; 2] = ["eedly", "eed"];
 static STEP_1B_SUFFIXES_2: [&str; 4] = ["ingly", "edly", "ing", "ed"];
-static STEP_2_SUFFIXES: [&str; 25] = [
-    "ization", "ational", "fulness", "ousness", "iveness", "tional", "biliti", "lessli", "entli",
-    "ation", "alism", "aliti", "ousli", "iviti", "ogist", "fulli", "enci", "anci", "abli", "izer",
-    "ator", "alli", "bli", "ogi", "li",
-];
-
-static STEP_3_SUFFIXES: [&str; 9] = [
-    "ational", "tional", "alize", "icate", "iciti", "ative", "ical", "ness", "ful",
-];
-static STEP_4_SUFFIXES: [&str; 18] = [
-    "ement", "ance", "ence", "able", "ible", "ment", "ant", "ent", "ism", "ate", "iti", "ous",
-    "ive", "ize", "ion", "al", "er", "ic",
-];
+// suffix tables are static (suffix, replacement) pairs grouped by last letter, only
+// group of word's last letter is checked, in the original order
+// r1 beginnings all start with different letter, so word's first letter selects
+// the only one that can match
+fn r1_begining(first: Option<&u8>) -> Option<&'static str> {
+    match first {
+        Some(b'g') => Some("gener"),
+        Some(b'c') => Some("commun"),
+        Some(b'a') => Some("arsen"),
+        Some(b'p') => Some("past"),
+        Some(b'u') => Some("univers"),
+        Some(b'l') => Some("later"),
+        Some(b'e') => Some("emerg"),
+        Some(b'o') => Some("organ"),
+        _ => None,
+    }
+}
+
+fn step_2_suffixes(last: Option<&u8>) -> &'static [(&'static str, &'static str)] {
+    match last {
+        Some(b'n') => &[
+            ("ization", "ize"),
+            ("ational", "ate"),
+            ("tional", "tion"),
+            ("ation", "ate"),
+        ],
+        Some(b's') => &[("fulness", "ful"), ("ousness", "ous"), ("iveness", "ive")],
+        Some(b'i') => &[
+            ("biliti", "ble"),
+            ("lessli", "less"),
+            ("entli", "ent"),
+            ("aliti", "al"),
+            ("ousli", "ous"),
+            ("iviti", "ive"),
+            ("fulli", "ful"),
+            ("enci", "ence"),
+            ("anci", "ance"),
+            ("abli", "able"),
+            ("alli", "al"),
+            ("bli", "ble"),
+            ("ogi", "og"),
+            ("li", ""),
+        ],
+        Some(b'm') => &[("alism", "al")],
+        Some(b't') => &[("ogist", "og")],
+        Some(b'r') => &[("izer", "ize"), ("ator", "ate")],
+        _ => &[],
+    }
+}
+
+fn step_3_suffixes(last: Option<&u8>) -> &'static [(&'static str, &'static str)] {
+    match last {
+        Some(b'l') => &[
+            ("ational", "ate"),
+            ("tional", "tion"),
+            ("ical", "ic"),
+            ("ful", ""),
+        ],
+        Some(b'e') => &[("alize", "al"), ("icate", "ic"), ("ative", "")],
+        Some(b'i') => &[("iciti", "ic")],
+        Some(b's') => &[("ness", "")],
+        _ => &[],
+    }
+}
+
+fn step_4_suffixes(last: Option<&u8>) -> &'static [&'static str] {
+    match last {
+        Some(b't') => &["ement", "ment", "ant", "ent"],
+        Some(b'e') => &["ance", "ence", "able", "ible", "ate", "ive", "ize"],
+        Some(b'm') => &["ism"],
+        Some(b'i') => &["iti"],
+        Some(b's') => &["ous"],
+        Some(b'n') => &["ion"],
+        Some(b'l') => &["al"],
+        Some(b'r') => &["er"],
+        Some(b'c') => &["ic"],
+        _ => &[],
+    }
+}
+
+// exception words are matched with match expressions, which compare by length first
+// instead of scanning every entry
+fn is_exception_word(word: &str) -> bool {
+    matches!(
+        word,
+        "sky" | "news" | "howe" | "atlas" | "cosmos" | "bias" | "andes"
+    )
+}
+
+fn pre_stem_exception(word: &str) -> Option<&'static str> {
+    match word {
+        "skis" => Some("ski"),
+        "skies" => Some("sky"),
+        "idly" => Some("idl"),
+        "gently" => Some("gentl"),
+        "ugly" => Some("ugli"),
+        "early" => Some("earli"),
+        "only" => Some("onli"),
+        "singly" => Some("singl"),
+        "sky" => Some("sky"),
+        "news" => Some("news"),
+        "howe" => Some("howe"),
+        _ => None,
+    }
+}
+
+// stemmed words are ascii, so they are processed as bytes instead of chars
+fn is_vowel(c: u8) -> bool {
+    c.is_ascii_lowercase() && (VOWELS_MASK >> (c - b'a')) & 1 == 1
+}
+
+fn is_short_syllabe_blocker(c: u8) -> bool {
+    c == b'Y' || (c.is_ascii_lowercase() && (SHORT_SYLLABE_BLOCKERS_MASK >> (c - b'a')) & 1 == 1)
+}
 
 pub struct SnowballStemmer {
     r1: usize,
     r2: usize,
-    pre_stem_exceptions: HashMap<String, String>,
-    step_2_suffix_map: HashMap<String, String>,
-    step_3_suffix_map: HashMap<String, String>,
 }
 
 impl SnowballStemmer {
     pub fn new() -> Self {
-        let pre_stem_exceptions: HashMap<String, String> = HashMap::from([
-            (String::from("skis"), String::from("ski")),
-            (String::from("skies"), String::from("sky")),
-            (String::from("idly"), String::from("idl")),
-            (String::from("gently"), String::from("gentl")),
-            (String::from("ugly"), String::from("ugli")),
-            (String::from("early"), String::from("earli")),
-            (String::from("only"), String::from("onli")),
-            (String::from("singly"), String::from("singl")),
-            (String::from("sky"), String::from("sky")),
-            (String::from("news"), String::from("news")),
-            (String::from("howe"), String::from("howe")),
-        ]);
-
-        let step_2_suffix_map: HashMap<String, String> = HashMap::from([
-            (String::from("ization"), String::from("ize")),
-            (String::from("ational"), String::from("ate")),
-            (String::from("fulness"), String::from("ful")),
-            (String::from("ousness"), String::from("ous")),
-            (String::from("iveness"), String::from("ive")),
-            (String::from("tional"), String::from("tion")),
-            (String::from("biliti"), String::from("ble")),
-            (String::from("lessli"), String::from("less")),
-            (String::from("entli"), String::from("ent")),
-            (String::from("ation"), String::from("ate")),
-            (String::from("alism"), String::from("al")),
-            (String::from("aliti"), String::from("al")),
-            (String::from("ousli"), String::from("ous")),
-            (String::from("iviti"), String::from("ive")),
-            (String::from("ogist"), String::from("og")),
-            (String::from("fulli"), String::from("ful")),
-            (String::from("enci"), String::from("ence")),
-            (String::from("anci"), String::from("ance")),
-            (String::from("abli"), String::from("able")),
-            (String::from("izer"), String::from("ize")),
-            (String::from("ator"), String::from("ate")),
-            (String::from("alli"), String::from("al")),
-            (String::from("bli"), String::from("ble")),
-            (String::from("ogi"), String::from("og")),
-            (String::from("li"), String::from("")),
-        ]);
-
-        let step_3_suffix_map: HashMap<String, String> = HashMap::from([
-            (String::from("ational"), String::from("ate")),
-            (String::from("tional"), String::from("tion")),
-            (String::from("alize"), String::from("al")),
-            (String::from("icate"), String::from("ic")),
-            (String::from("iciti"), String::from("ic")),
-            (String::from("ative"), String::from("")),
-            (String::from("ical"), String::from("ic")),
-            (String::from("ness"), String::from("")),
-            (String::from("ful"), String::from("")),
-        ]);
-
-        SnowballStemmer {
-            r1: 0,
-            r2: 0,
-            pre_stem_exceptions: pre_stem_exceptions,
-            step_2_suffix_map: step_2_suffix_map,
-            step_3_suffix_map: step_3_suffix_map,
-        }
+        SnowballStemmer { r1: 0, r2: 0 }
     }
 
     pub fn stem(&mut self, mut word: String) -> String {
-        if word.len() <= 2 || EXCEPTION_WORDS.contains(&word.as_str()) || !word.is_ascii() {
+        if word.len() <= 2 || is_exception_word(&word) || !word.is_ascii() {
             return word;
         }
 
         self.remove_initial_apostrophe(&mut word);
-        match self.pre_stem_exceptions.get(&word) {
-            Some(word) => return word.to_string(),
+        match pre_stem_exception(&word) {
+            Some(stem) => {
+                // word buffer is reused for the stem
+                word.clear();
+                word.push_str(stem);
+                return word;
+            }
             None => (),
         }
 
@@ -120,7 +161,15 @@ impl SnowballStemmer {
         self.step_3(&mut word);
         self.step_4(&mut word);
         self.step_5(&mut word);
-        word.replace("Y", "y")
+
+        // restore ys in place instead of allocating replaced copy of word
+        for i in 0..word.len() {
+            if word.as_bytes()[i] == b'Y' {
+                word[i..i + 1].make_ascii_lowercase();
+            }
+        }
+
+        word
     }
 }
 
@@ -129,21 +178,16 @@ impl SnowballStemmer {
     fn ends_with_short_syllabe(&self, word: &str) -> bool {
         if word == "past" {
             return true;
-        } else if word.len() > 2
-            && !VOWELS.contains(&word.chars().nth(word.len() - 3).unwrap())
-            && VOWELS.contains(&word.chars().nth(word.len() - 2).unwrap())
-            && !['a', 'e', 'i', 'o', 'u', 'w', 'x', 'Y']
-                .contains(&word.chars().nth(word.len() - 1).unwrap())
-        {
-            return true;
-        } else if word.len() == 2
-            && VOWELS.contains(&word.chars().nth(0).unwrap())
-            && !VOWELS.contains(&word.chars().nth(1).unwrap())
-        {
-            return true;
         }
 
-        return false;
+        // syllabe is classified from last two or three bytes with vowel masks lookups
+        match word.as_bytes() {
+            [.., first, second, last] => {
+                !is_vowel(*first) && is_vowel(*second) && !is_short_syllabe_blocker(*last)
+            }
+            [first, second] => is_vowel(*first) && !is_vowel(*second),
+            _ => false,
+        }
     }
 
     fn is_short(&self, word: &String) -> bool {
@@ -155,29 +199,28 @@ impl SnowballStemmer {
     }
 
     fn remove_initial_apostrophe(&self, word: &mut String) {
-        if word.starts_with("'") {
-            let _ = &word.remove(0);
+        // only single leading apostrophe is removed, in place
+        if word.starts_with('\'') {
+            word.remove(0);
         }
     }
 
     fn set_ys(&self, word: &mut String) {
+        // ys are uppercased in place, ascii case change never changes word length
         if word.starts_with("y") {
-            word.replace_range(0..1, "Y");
+            word[0..1].make_ascii_uppercase();
         }
 
-        let mut is_vowel = false;
-        let chars: Vec<char> = word.chars().collect();
-
-        for (i, c) in chars.into_iter().enumerate() {
-            if is_vowel && c == 'y' {
-                word.replace_range(i..i + 1, "Y");
+        // word is ascii, so bytes are scanned in place instead of collecting chars,
+        // vowel flag is taken from byte before it's replaced
+        let mut prev_is_vowel = false;
+        for i in 0..word.len() {
+            let c = word.as_bytes()[i];
+            if prev_is_vowel && c == b'y' {
+                word[i..i + 1].make_ascii_uppercase();
             }
 
-            if VOWELS.contains(&c) {
-                is_vowel = true;
-            } else {
-                is_vowel = false;
-            }
+            prev_is_vowel = is_vowel(c);
         }
     }
 
@@ -185,49 +228,45 @@ impl SnowballStemmer {
         self.r1 = word.len();
         self.r2 = word.len();
 
-        for prefix in R1_BEGININGS.iter() {
-            if !word.starts_with(prefix) {
-                continue;
-            }
-
+        if let Some(prefix) = r1_begining(word.as_bytes().first())
+            && word.starts_with(prefix)
+        {
             self.r1 = prefix.len();
 
-            let chars: &Vec<char> = &word[self.r1..].chars().collect();
-            let mut is_vowel = false;
+            let mut prev_is_vowel = false;
 
-            for (i, c) in chars.into_iter().enumerate() {
-                if VOWELS.contains(&c) {
-                    is_vowel = true;
+            for (i, c) in word[self.r1..].bytes().enumerate() {
+                if is_vowel(c) {
+                    prev_is_vowel = true;
                 } else {
-                    if is_vowel {
+                    if prev_is_vowel {
                         self.r2 = self.r1 + i + 1;
                         break;
                     }
 
-                    is_vowel = false;
+                    prev_is_vowel = false;
                 }
             }
 
             return;
         }
 
-        let chars: Vec<char> = word.chars().collect();
-        let mut is_vowel = false;
+        let mut prev_is_vowel = false;
         let mut matches = 0;
 
-        for (i, c) in chars.into_iter().enumerate() {
-            if VOWELS.contains(&c) {
-                is_vowel = true;
+        for (i, c) in word.bytes().enumerate() {
+            if is_vowel(c) {
+                prev_is_vowel = true;
             } else {
-                if is_vowel && matches == 0 {
+                if prev_is_vowel && matches == 0 {
                     matches += 1;
                     self.r1 = i + 1;
-                } else if is_vowel && matches == 1 {
+                } else if prev_is_vowel && matches == 1 {
                     self.r2 = i + 1;
                     break;
                 }
 
-                is_vowel = false;
+                prev_is_vowel = false;
             }
         }
     }
@@ -251,21 +290,16 @@ impl SnowballStemmer {
             if *suffix == "sses" {
                 word.truncate(word.len() - 2);
             } else if ["ied", "ies"].contains(&suffix) {
-                word.truncate(word.len() - 3);
-
-                if word.len() > 1 {
-                    word.insert_str(word.len(), "i");
-                } else {
-                    word.insert_str(word.len(), "ie");
-                }
-            } else if *suffix == "s" && word.len() > 2 {
-                let chars: &Vec<char> = &word[..word.len() - 2].chars().collect();
-                for c in chars.into_iter() {
-                    if VOWELS.contains(&c) {
-                        word.truncate(word.len() - 1);
-                        break;
-                    }
-                }
+                // suffix is replaced in place, without truncating and inserting
+                let repl = if word.len() > 4 { "i" } else { "ie" };
+                word.replace_range(word.len() - 3.., repl);
+            } else if *suffix == "s"
+                && word.len() > 2
+                && word.as_bytes()[..word.len() - 2]
+                    .iter()
+                    .any(|c| is_vowel(*c))
+            {
+                word.truncate(word.len() - 1);
             }
 
             break;
@@ -295,8 +329,8 @@ impl SnowballStemmer {
             // special case for 'ing'
             if *suffix == "ing" {
                 if word.len() == 5
-                    && word.chars().nth(word.len() - 4).unwrap() == 'y'
-                    && !VOWELS.contains(&word.chars().nth(word.len() - 5).unwrap())
+                    && word.as_bytes()[word.len() - 4] == b'y'
+                    && !is_vowel(word.as_bytes()[word.len() - 5])
                 {
                     word.replace_range(word.len() - 4.., "ie");
                     return;
@@ -308,21 +342,20 @@ impl SnowballStemmer {
             }
 
             if word[..word.len() - suffix.len()]
-                .chars()
-                .into_iter()
-                .any(|c| VOWELS.contains(&c))
+                .bytes()
+                .any(|c| is_vowel(c))
             {
                 // delete suffix
                 word.truncate(word.len() - suffix.len());
 
                 if ["at", "bl", "iz"].iter().any(|s| word.ends_with(s)) {
-                    word.insert(word.len(), 'e');
+                    word.push('e');
                 } else if DOUBLES.iter().any(|s| word.ends_with(s))
-                    && !(word.len() == 3 && ['a', 'e', 'o'].contains(&word.chars().nth(0).unwrap()))
+                    && !(word.len() == 3 && [b'a', b'e', b'o'].contains(&word.as_bytes()[0]))
                 {
                     word.truncate(word.len() - 1);
                 } else if self.is_short(&word) {
-                    word.insert(word.len(), 'e');
+                    word.push('e');
                 }
             }
 
@@ -332,15 +365,15 @@ impl SnowballStemmer {
 
     fn step_1c(&self, word: &mut String) {
         if word.len() > 2
-            && ['y', 'Y'].contains(&word.chars().nth(word.len() - 1).unwrap())
-            && !VOWELS.contains(&word.chars().nth(word.len() - 2).unwrap())
+            && [b'y', b'Y'].contains(&word.as_bytes()[word.len() - 1])
+            && !is_vowel(word.as_bytes()[word.len() - 2])
         {
             word.replace_range(word.len() - 1.., "i");
         }
     }
 
     fn step_2(&self, word: &mut String) {
-        for suffix in STEP_2_SUFFIXES.iter() {
+        for (suffix, repl) in step_2_suffixes(word.as_bytes().last()) {
             if !word.ends_with(suffix) {
                 continue;
             }
@@ -349,15 +382,11 @@ impl SnowballStemmer {
                 return;
             }
 
-            let repl = self.step_2_suffix_map.get(*suffix).unwrap();
-            if word.len() >= 4
-                && *suffix == "ogi"
-                && word.chars().nth(word.len() - 4).unwrap() == 'l'
-            {
+            if word.len() >= 4 && *suffix == "ogi" && word.as_bytes()[word.len() - 4] == b'l' {
                 word.replace_range(word.len() - suffix.len().., repl);
             } else if word.len() >= 3
                 && *suffix == "li"
-                && LI_ENDINGS.contains(&word.chars().nth(word.len() - 3).unwrap())
+                && LI_ENDINGS.contains(&word.as_bytes()[word.len() - 3])
             {
                 word.replace_range(word.len() - suffix.len().., repl);
             } else if !["ogi", "li"].contains(suffix) {
@@ -369,7 +398,7 @@ impl SnowballStemmer {
     }
 
     fn step_3(&self, word: &mut String) {
-        for suffix in STEP_3_SUFFIXES.iter() {
+        for (suffix, repl) in step_3_suffixes(word.as_bytes().last()) {
             if !word.ends_with(suffix) {
                 continue;
             }
@@ -378,7 +407,6 @@ impl SnowballStemmer {
                 return;
             }
 
-            let repl = self.step_3_suffix_map.get(*suffix).unwrap();
             if *suffix == "ative" && word.len() - suffix.len() >= self.r2 {
                 word.replace_range(word.len() - suffix.len().., repl);
             } else if *suffix != "ative" {
@@ -390,7 +418,7 @@ impl SnowballStemmer {
     }
 
     fn step_4(&self, word: &mut String) {
-        for suffix in STEP_4_SUFFIXES.iter() {
+        for suffix in step_4_suffixes(word.as_bytes().last()) {
             if !word.ends_with(suffix) {
                 continue;
             }
@@ -399,12 +427,10 @@ impl SnowballStemmer {
                 return;
             }
 
-            if word.len() > 3
-                && *suffix == "ion"
-                && ['s', 't'].contains(&word.chars().nth(word.len() - 4).unwrap())
-            {
-                word.truncate(word.len() - suffix.len());
-            } else if *suffix != "ion" {
+            // 'ion' is removed only after 's' or 't', any other suffix always
+            let removable = *suffix != "ion"
+                || (word.len() > 3 && matches!(word.as_bytes()[word.len() - 4], b's' | b't'));
+            if removable {
                 word.truncate(word.len() - suffix.len());
             }
 
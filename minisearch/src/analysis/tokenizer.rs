@@ -18,28 +18,81 @@ pub struct TokenizedQuery {
 
 pub struct Tokenizer {
     stemmer: SnowballStemmer,
+    // stems keyed by word before stemming, shared between documents and queries,
+    // stop words are cached as None so single lookup both filters and stems word
+    stems: HashMap<String, Option<String>>,
+    // bitmask of stop words lengths, words of other lengths skip stop words hashing
+    stop_words_lengths: u64,
     config: Arc<Config>,
 }
 
+fn length_bit(len: usize) -> u64 {
+    1 << len.min(63)
+}
+
 impl Tokenizer {
     pub fn new(config: Arc<Config>) -> Self {
         Self {
             stemmer: SnowballStemmer::new(),
+            stems: HashMap::new(),
+            stop_words_lengths: config
+                .stop_words
+                .iter()
+                .fold(0, |mask, word| mask | length_bit(word.len())),
             config: config,
         }
     }
 
+    fn stem<'a>(&'a mut self, word: &'a str) -> Option<&'a str> {
+        let maybe_stop_word = self.stop_words_lengths & length_bit(word.len()) != 0;
+        if word.len() <= 2 || word.bytes().all(|c| c.is_ascii_digit()) {
+            // stemmer doesn't change short or numeric words, so they skip it and the cache
+            if maybe_stop_word && self.config.stop_words.contains(word) {
+                return None;
+            }
+
+            return Some(word);
+        }
+
+        if self.stems.len() >= self.config.stem_cache_size && !self.stems.contains_key(word) {
+            // simple bounded cache, start over once it is full and word has to be inserted
+            self.stems.clear();
+        }
+
+        let (stemmer, stop_words) = (&mut self.stemmer, &self.config.stop_words);
+        self.stems
+            .entry_ref(word)
+            .or_insert_with(|| {
+                if maybe_stop_word && stop_words.contains(word) {
+                    None
+                } else {
+                    Some(stemmer.stem(word.to_string()))
+                }
+            })
+            .as_deref()
+    }
+
     pub fn tokenize_doc(&mut self, doc: &mut str) -> (u32, HashMap<String, Vec<u32>>) {
         let mut tokens: HashMap<String, Vec<u32>> = HashMap::new();
 
-        let mut i = 0;
-        for word in doc.unicode_words() {
-            let word = word.to_owned().to_ascii_lowercase();
-            if self.config.stop_words.contains(word.as_str()) {
-                continue;
-            }
-            let word = self.stemmer.stem(word);
-            tokens.entry_ref(&word).or_default().push(i);
+        // lowercased words are written into single reused buffer, stems are cached so
+        // in most cases nothing is allocated per word
+        let (mut i, mut word) = (0, String::new());
+        for raw_word in doc.unicode_words() {
+            word.clear();
+            word.push_str(raw_word);
+            word.make_ascii_lowercase();
+            let stem = match self.stem(&word) {
+                Some(stem) => stem,
+                None => continue,
+            };
+
+            // most words occur once in document, so positions start exactly sized and
+            // aren't reallocated when they are boxed for the index
+            tokens
+                .entry_ref(stem)
+                .and_modify(|positions| positions.push(i))
+                .or_insert_with(|| vec![i]);
             i += 1;
         }
 
@@ -50,12 +103,11 @@ impl Tokenizer {
         let mut tokens: Vec<Token> = Vec::with_capacity(query.terms.len());
 
         for term in query.terms {
-            if self.config.stop_words.contains(term.text) {
-                continue;
-            }
-
             let token = Token {
-                text: self.stemmer.stem(term.text.to_string()),
+                text: match self.stem(term.text) {
+                    Some(stem) => stem.to_string(),
+                    None => continue,
+                },
                 fuzz: term.fuzz,
             };
             tokens.push(token);
@@ -1,3 +1,4 @@
+use hashbrown::DefaultHashBuilder;
 use serde::Deserialize;
 use std::{collections::HashSet, fs, io, path::PathBuf};
 use thiserror::Error;
@@ -37,8 +38,14 @@ pub struct Config {
     pub index_buffer_size: u64,
     pub index_save_after_operations: u64,
     pub index_save_after_seconds: u64,
+    // search config
+    pub fuzzy_cache_size: usize,
+    pub query_cache_size: usize,
+    // tokenizer config
+    pub stem_cache_size: usize,
     // additional config
-    pub stop_words: HashSet<String>,
+    // checked for every token, so hashed with faster hasher than default SipHash
+    pub stop_words: HashSet<String, DefaultHashBuilder>,
 }
 
 impl Default for Config {
@@ -56,6 +63,11 @@ impl Default for Config {
             index_buffer_size: 1024 * 1024,
             index_save_after_operations: 100_000,
             index_save_after_seconds: 5,
+            // search config
+            fuzzy_cache_size: 16_384,
+            query_cache_size: 4_096,
+            // tokenizer config
+            stem_cache_size: 65_536,
             // additional config
             stop_words: [
                 "a", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is",
@@ -19,7 +19,6 @@ use bincode::enc::EncoderImpl;
 use bincode::enc::write::SizeWriter;
 use bincode::error::{DecodeError, EncodeError};
 use bincode::{Decode, Encode};
-use hashbrown::hash_map::Entry;
 use hashbrown::{HashMap, HashSet};
 use memmap2::Mmap;
 use nohash_hasher::BuildNoHashHasher;
@@ -479,27 +478,22 @@ impl LogsManager {
     ) -> Result<HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>>, LogsReaderError> {
         let reader = LogsReader::new(&self.buffer.dir, direction)?;
 
-        let mut index: HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>> = HashMap::default();
-        let mut tokens_cur_index: HashMap<u32, usize, BuildNoHashHasher<u32>> = HashMap::default();
+        // postings are kept together with index of next posting to fill, so each log
+        // needs single lookup, tokens with no postings left are dropped at the end
+        let mut postings_map: HashMap<u32, (Vec<Posting>, usize), BuildNoHashHasher<u32>> =
+            HashMap::default();
         let mut deleted: HashSet<u128> = HashSet::default();
-        let mut empty_postings = vec![];
 
         for res in reader {
             let (meta, log) = res?;
 
-            let idx = tokens_cur_index
-                .entry(log.header().token)
-                .or_insert(log.header().postings_num as usize - 1);
-
-            let postings = match index.entry(log.header().token) {
-                Entry::Vacant(e) => {
-                    if log.header().postings_num == 0 {
-                        empty_postings.push(log.header().token)
-                    }
-                    e.insert(vec![Posting::default(); log.header().postings_num as usize])
-                }
-                Entry::Occupied(e) => e.into_mut(),
-            };
+            let (postings, idx) = postings_map.entry(log.header().token).or_insert_with(|| {
+                let postings_num = log.header().postings_num as usize;
+                (
+                    vec![Posting::default(); postings_num],
+                    postings_num.wrapping_sub(1),
+                )
+            });
 
             match log {
                 IndexLogImpl::Add(log) => {
@@ -514,8 +508,12 @@ impl LogsManager {
             }
         }
 
-        for token in empty_postings {
-            index.remove(&token);
+        let mut index: HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>> =
+            HashMap::with_capacity_and_hasher(postings_map.len(), BuildNoHashHasher::default());
+        for (token, (postings, _)) in postings_map {
+            if !postings.is_empty() {
+                index.insert(token, postings);
+            }
         }
 
         Ok(index)
@@ -529,14 +527,15 @@ impl LogsManager {
 #[derive(Decode, Encode, PartialEq, Debug, Clone)]
 pub struct Posting {
     pub doc_id: u128,
-    pub positions: Vec<u32>,
+    // boxed slice has no capacity field which makes posting smaller, encoded same way as vec
+    pub positions: Box<[u32]>,
 }
 
 impl Posting {
     fn default() -> Self {
         Self {
             doc_id: 0,
-            positions: Vec::with_capacity(0),
+            positions: Box::new([]),
         }
     }
 }
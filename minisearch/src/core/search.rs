@@ -1,19 +1,19 @@
-use crate::analysis::tokenizer::Tokenizer;
+use crate::analysis::tokenizer::{TokenizedQuery, Tokenizer};
 use crate::config::Config;
 use crate::core::index::{IndexManager, Posting};
 use crate::errors::{BincodePersistenceError, UlidDecodeError, UlidMonotonicError};
 use crate::matching::intersect::PostingListIntersection;
 use crate::matching::mis::MinimalIntervalSemanticMatch;
 use crate::query::parser::Query;
-use crate::query::scoring::{bm25, max_bm25};
+use crate::query::scoring::{bm25, doc_length_norm, max_bm25};
 use crate::storage::documents::{Document, DocumentsManager};
 use crate::utils::hasher::TokenHasher;
 use crate::utils::trie::Trie;
 use bincode::{Decode, Encode};
-use hashbrown::HashSet;
+use hashbrown::{HashMap, HashSet};
 use pyo3::exceptions::PyKeyError;
 use pyo3::prelude::*;
-use std::cmp::{Ordering, Reverse};
+use std::cmp::{Ordering, Reverse, min};
 use std::collections::BinaryHeap;
 use std::fs::{self, File};
 use std::path::PathBuf;
@@ -49,6 +49,7 @@ struct SearchMeta {
     path: PathBuf,
     operations: u32,
     last_save: u64,
+    total_doc_len: u64, // exact sum of documents lengths, avg is derived from it
     data: SearchMetaData,
     config: Arc<Config>,
 }
@@ -62,23 +63,34 @@ impl SearchMeta {
             last_save: SystemTime::now()
                 .duration_since(SystemTime::UNIX_EPOCH)?
                 .as_secs(),
+            total_doc_len: 0,
             data: SearchMetaData { avg_doc_len: 1.0 },
         })
     }
 
-    fn load(path: PathBuf, config: Arc<Config>) -> Result<Self, BincodePersistenceError> {
+    fn load(
+        path: PathBuf,
+        config: Arc<Config>,
+        docs_num: usize,
+        total_doc_len: u64,
+    ) -> Result<Self, BincodePersistenceError> {
         if !fs::exists(&path)? {
             File::create(&path)?;
             return Ok(Self::new(path, config)?);
         }
 
         let mut file = File::open(&path)?;
-        let data: SearchMetaData = if file.metadata()?.len() > 0 {
+        let mut data: SearchMetaData = if file.metadata()?.len() > 0 {
             bincode::decode_from_std_read(&mut file, bincode::config::standard())?
         } else {
             SearchMetaData { avg_doc_len: 1.0 }
         };
 
+        // recompute avg from loaded documents, so float error doesn't carry over restarts
+        if docs_num > 0 {
+            data.avg_doc_len = total_doc_len as f64 / docs_num as f64;
+        }
+
         Ok(Self {
             config: config,
             path: path,
@@ -86,18 +98,23 @@ impl SearchMeta {
             last_save: SystemTime::now()
                 .duration_since(SystemTime::UNIX_EPOCH)?
                 .as_secs(),
+            total_doc_len: total_doc_len,
             data: data,
         })
     }
 
     fn update_avg_doc_len(
         &mut self,
-        docs_num: usize,
         docs_num_after: usize,
-        new_doc_len: i64,
+        doc_len_delta: i64,
     ) -> Result<(), BincodePersistenceError> {
-        self.data.avg_doc_len = (self.data.avg_doc_len * docs_num as f64 + new_doc_len as f64)
-            / (docs_num_after as f64);
+        // keep integer total instead of rescaling avg, which accumulates round-off
+        self.total_doc_len = self.total_doc_len.saturating_add_signed(doc_len_delta);
+        self.data.avg_doc_len = if docs_num_after > 0 {
+            self.total_doc_len as f64 / docs_num_after as f64
+        } else {
+            1.0
+        };
 
         let cur_ts = SystemTime::now()
             .duration_since(SystemTime::UNIX_EPOCH)?
@@ -154,6 +171,14 @@ impl PartialEq for SearchResult {
 
 impl Eq for SearchResult {}
 
+#[pymethods]
+impl PySearchResult {
+    // prefix is read directly from result, without copying document into python first
+    fn content_prefix(&mut self, n: usize) -> PyResult<String> {
+        self.document.content_prefix(n)
+    }
+}
+
 #[pyclass(name = "Search")]
 pub struct Search {
     index_manager: IndexManager,
@@ -163,32 +188,49 @@ pub struct Search {
     hasher: TokenHasher,
     fuzzy_trie: Trie,
     meta: SearchMeta,
+    // parsed and tokenized queries, same query strings are searched repeatedly
+    queries_cache: HashMap<String, Arc<TokenizedQuery>>,
+    queries_cache_size: usize,
 }
 
 #[pymethods]
 impl Search {
     #[new]
     fn new(dir: PathBuf, config: Option<PathBuf>) -> PyResult<Self> {
-        let mut fuzzy_trie = Trie::new();
+        let config = Arc::new(Config::load(config)?);
+
+        let mut fuzzy_trie = Trie::new(config.fuzzy_cache_size);
         for i in 0..3 {
             fuzzy_trie.init_automaton(i);
         }
 
-        let config = Arc::new(Config::load(config)?);
-
         let hasher = TokenHasher::load(&dir, Arc::clone(&config))?;
         for token in hasher.tokens() {
             fuzzy_trie.add(token);
         }
 
+        let documents_manager = DocumentsManager::load(dir.clone(), Arc::clone(&config))?;
+        let total_doc_len = documents_manager
+            .docs
+            .values()
+            .map(|doc| doc.len as u64)
+            .sum();
+
         Ok(Self {
             index_manager: IndexManager::load(&dir, Arc::clone(&config))?,
-            meta: SearchMeta::load(dir.join("meta"), Arc::clone(&config))?,
+            meta: SearchMeta::load(
+                dir.join("meta"),
+                Arc::clone(&config),
+                documents_manager.docs.len(),
+                total_doc_len,
+            )?,
             hasher: hasher,
-            documents_manager: DocumentsManager::load(dir, Arc::clone(&config))?,
+            documents_manager: documents_manager,
             ulid_generator: Generator::new(),
             tokenizer: Tokenizer::new(Arc::clone(&config)),
             fuzzy_trie: fuzzy_trie,
+            queries_cache: HashMap::new(),
+            queries_cache_size: config.query_cache_size,
         })
     }
 
@@ -200,9 +242,12 @@ impl Search {
 
         let (tokens_num, tokens_map) = self.tokenizer.tokenize_doc(&mut doc);
 
+        // documents waiting in deleted buffer are still part of total length until they
+        // are force deleted, so they are counted here as well
         self.meta.update_avg_doc_len(
-            self.documents_manager.docs.len(),
-            self.documents_manager.docs.len() + 1,
+            self.documents_manager.docs.len()
+                + self.documents_manager.deleted_docs_buffer.len()
+                + 1,
             tokens_num as i64,
         )?;
 
@@ -215,7 +260,9 @@ impl Search {
             let token = self.hasher.add(token)?;
             let posting = Posting {
                 doc_id: doc_id.0,
-                positions: positions,
+                // positions live in index for the whole index lifetime, so they
+                // are stored exactly sized without spare growth capacity
+                positions: positions.into_boxed_slice(),
             };
             self.index_manager.insert(token, posting)?;
 
@@ -228,6 +275,11 @@ impl Search {
         Ok(doc_id.to_string())
     }
 
+    fn add_many(&mut self, docs: Vec<String>) -> PyResult<Vec<String>> {
+        // whole batch is added within single call from python
+        docs.into_iter().map(|doc| self.add(doc)).collect()
+    }
+
     fn get(&self, id: String) -> PyResult<Document> {
         let id = match Ulid::from_string(&id) {
             Ok(val) => val,
@@ -244,7 +296,7 @@ impl Search {
             }
         };
 
-        Ok(doc.clone())
+        Ok(doc.to_py())
     }
 
     fn delete(&mut self, id: String) -> PyResult<bool> {
@@ -264,24 +316,27 @@ impl Search {
         self.force_delete()
     }
 
-    fn search(&mut self, mut query: String, top_k: u32) -> PyResult<Vec<PySearchResult>> {
-        let query = Query::parse(&mut query)?;
-
+    fn search(&mut self, query: String, top_k: u32) -> PyResult<Vec<PySearchResult>> {
+        let query = self.tokenize_query(query)?;
         let slop = query.slop;
-        let query = self.tokenizer.tokenize_query(query);
 
         let mut intersection = match PostingListIntersection::new(
             query,
             &self.index_manager.index,
             &self.hasher,
-            &self.fuzzy_trie,
+            &mut self.fuzzy_trie,
+            self.documents_manager.docs.len() as u64,
         ) {
             Some(iter) => iter,
             _ => return Ok(vec![]),
         };
 
+        // top_k results are kept in bounded min heap, without top_k every match
+        // is returned so results are collected as they come and sorted once,
+        // heap never holds more results than there are documents
         let mut results: BinaryHeap<Reverse<SearchResult>> =
-            BinaryHeap::with_capacity(top_k as usize);
+            BinaryHeap::with_capacity(min(top_k as usize, self.documents_manager.docs.len()));
+        let mut all_results: Vec<SearchResult> = Vec::new();
 
         while let Some(pointers) = intersection.next() {
             let (doc_id, mut score) = (pointers[0][0].doc_id, 0.0);
@@ -293,11 +348,13 @@ impl Search {
                 continue;
             }
 
-            let max_score = max_bm25(
-                &self.documents_manager,
-                self.meta.data.avg_doc_len,
-                pointers,
-            );
+            // document length norm is computed once and shared by upper bound and all matches scoring
+            let doc_norm = match self.documents_manager.docs.get(&doc_id) {
+                Some(doc) => doc_length_norm(doc.tokens.len() as u32, self.meta.data.avg_doc_len),
+                None => continue,
+            };
+
+            let max_score = max_bm25(doc_norm, pointers);
 
             if top_k != 0
                 && results.len() == top_k as usize
@@ -308,26 +365,22 @@ impl Search {
                 continue;
             }
 
-            for mis_result in
-                MinimalIntervalSemanticMatch::new(&self.index_manager.index, pointers, slop as i32)
-            {
-                let doc = match self.documents_manager.docs.get(&doc_id) {
-                    Some(doc) => doc,
-                    None => continue,
-                };
-
-                score = bm25(
-                    self.documents_manager.docs.len() as u64,
-                    doc.tokens.len() as u32,
-                    self.meta.data.avg_doc_len,
-                    &self.index_manager.index,
-                    mis_result,
-                )
-                .max(score);
+            let mut mis = MinimalIntervalSemanticMatch::new(pointers, slop as i32);
+            while let Some(mis_result) = mis.next_match() {
+                score = bm25(doc_norm, mis_result).max(score);
+                if score >= max_score {
+                    // document score is max over all matches, nothing can beat upper bound
+                    break;
+                }
             }
 
             if score > 0.0 {
-                if top_k == 0 || results.len() < top_k as usize {
+                if top_k == 0 {
+                    all_results.push(SearchResult {
+                        doc_id: doc_id,
+                        score: score,
+                    });
+                } else if results.len() < top_k as usize {
                     results.push(Reverse(SearchResult {
                         doc_id: doc_id,
                         score: score,
@@ -344,14 +397,20 @@ impl Search {
             }
         }
 
+        let results = if top_k == 0 {
+            all_results.sort_by(|x, y| y.cmp(x));
+            all_results
+        } else {
+            results.into_sorted_vec().into_iter().map(|r| r.0).collect()
+        };
+
         Ok(results
-            .into_sorted_vec()
             .into_iter()
             .filter_map(|r| {
-                if let Some(doc) = self.documents_manager.docs.get(&r.0.doc_id) {
+                if let Some(doc) = self.documents_manager.docs.get(&r.doc_id) {
                     Some(PySearchResult {
-                        document: doc.clone(),
-                        score: r.0.score,
+                        document: doc.to_py(),
+                        score: r.score,
                     })
                 } else {
                     None
@@ -360,6 +419,18 @@ impl Search {
             .collect())
     }
 
+    fn search_many(
+        &mut self,
+        queries: Vec<String>,
+        top_k: u32,
+    ) -> PyResult<Vec<Vec<PySearchResult>>> {
+        // whole batch is searched within single call from python
+        queries
+            .into_iter()
+            .map(|query| self.search(query, top_k))
+            .collect()
+    }
+
     fn flush(&mut self) -> PyResult<()> {
         self.force_delete()?;
         self.documents_manager.flush()?;
@@ -378,6 +449,27 @@ impl Search {
 }
 
 impl Search {
+    fn tokenize_query(&mut self, query: String) -> PyResult<Arc<TokenizedQuery>> {
+        if let Some(tokenized) = self.queries_cache.get(&query) {
+            return Ok(Arc::clone(tokenized));
+        }
+
+        // query is lowercased in place by parser, so original string is kept as cache key
+        let mut parsed = query.clone();
+        let tokenized = Arc::new(self.tokenizer.tokenize_query(Query::parse(&mut parsed)?));
+
+        if self.queries_cache.len() >= self.queries_cache_size {
+            // simple bounded cache, start over once it is full
+            self.queries_cache.clear();
+        }
+
+        if self.queries_cache_size > 0 {
+            self.queries_cache.insert(query, Arc::clone(&tokenized));
+        }
+
+        Ok(tokenized)
+    }
+
     fn force_delete(&mut self) -> PyResult<bool> {
         let (mut deleted_len_sum, deleted_docs_num) =
             (0, self.documents_manager.deleted_docs_buffer.len());
@@ -393,7 +485,6 @@ impl Search {
 
         // update avg len
         self.meta.update_avg_doc_len(
-            self.documents_manager.docs.len() + deleted_docs_num,
             self.documents_manager.docs.len(),
             -1 * deleted_len_sum as i64,
         )?;
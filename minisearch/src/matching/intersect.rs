@@ -1,71 +1,129 @@
 use crate::analysis::tokenizer::TokenizedQuery;
 use crate::core::index::Posting;
+use crate::query::scoring::token_weight;
+use crate::utils::gallop::gallop;
 use crate::utils::hasher::TokenHasher;
 use crate::utils::trie::Trie;
 use hashbrown::HashMap;
 use nohash_hasher::BuildNoHashHasher;
 use std::cmp::{Ordering, Reverse, max};
 use std::collections::BinaryHeap;
+use std::sync::Arc;
 use ulid::Ulid;
 
 #[derive(Clone, Debug)]
-pub struct TokenDocPointer {
+pub struct TokenDocPointer<'a> {
     pub doc_id: Ulid,
     pub doc_idx: u32,
     pub token: u32,
-    pub distance: u16,
-    pub postings_len: u64,
+    pub postings: &'a [Posting], // token postings, kept to avoid index lookup on every advance
+    pub weight: f64,
     pub tf: u64,
 }
 
 pub struct PostingListIntersection<'a> {
-    query: TokenizedQuery,
-    index: &'a HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>>,
-    docs: Vec<Vec<TokenDocPointer>>,
-    pointers: Vec<BinaryHeap<Reverse<TokenDocPointer>>>,
+    query: Arc<TokenizedQuery>,
+    docs: Vec<Vec<TokenDocPointer<'a>>>,
+    pointers: Vec<BinaryHeap<Reverse<TokenDocPointer<'a>>>>,
+    lead: usize, // index of query token with the fewest postings
 }
 
-impl Ord for TokenDocPointer {
+impl<'a> Ord for TokenDocPointer<'a> {
     fn cmp(&self, other: &Self) -> Ordering {
         self.doc_id.cmp(&other.doc_id)
     }
 }
 
-impl PartialOrd for TokenDocPointer {
+impl<'a> PartialOrd for TokenDocPointer<'a> {
     fn partial_cmp(&self, other: &Self) -> Option<Ordering> {
         Some(self.doc_id.cmp(&other.doc_id))
     }
 }
 
-impl PartialEq for TokenDocPointer {
+impl<'a> PartialEq for TokenDocPointer<'a> {
     fn eq(&self, other: &Self) -> bool {
         self.doc_id == other.doc_id
     }
 }
 
-impl Eq for TokenDocPointer {}
+impl<'a> Eq for TokenDocPointer<'a> {}
 
 impl<'a> PostingListIntersection<'a> {
     pub fn new(
-        query: TokenizedQuery,
+        query: Arc<TokenizedQuery>,
         index: &'a HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>>,
         hasher: &TokenHasher,
-        fuzzy_trie: &Trie,
+        fuzzy_trie: &mut Trie,
+        docs_num: u64,
     ) -> Option<Self> {
-        let docs: Vec<Vec<TokenDocPointer>> = Vec::with_capacity(query.tokens.len());
-        let mut pointers: Vec<BinaryHeap<Reverse<TokenDocPointer>>> =
+        // query made only of stop words has no tokens and can't match any document
+        if query.tokens.is_empty() {
+            return None;
+        }
+
+        let docs: Vec<Vec<TokenDocPointer<'a>>> = vec![Vec::new(); query.tokens.len()];
+        let mut pointers: Vec<BinaryHeap<Reverse<TokenDocPointer<'a>>>> =
             vec![BinaryHeap::new(); query.tokens.len()];
 
+        // fuzzy terms are expanded upfront, when there are many of them they share single trie walk
+        let fuzzy = (0..query.tokens.len())
+            .filter(|i| {
+                let query_token = &query.tokens[*i];
+                query_token.fuzz != 0
+                    && query_token.text.len() > query_token.fuzz as usize
+                    && !query.tokens[..*i]
+                        .iter()
+                        .any(|t| t.fuzz == query_token.fuzz && t.text == query_token.text)
+            })
+            .collect::<Vec<usize>>();
+
+        let mut expanded: Vec<Arc<[(u16, String)]>> = vec![Arc::default(); query.tokens.len()];
+        match fuzzy.len() {
+            0 => (),
+            1 => {
+                let query_token = &query.tokens[fuzzy[0]];
+                expanded[fuzzy[0]] = fuzzy_trie.search(query_token.fuzz, &query_token.text);
+            }
+            _ => {
+                let queries = fuzzy
+                    .iter()
+                    .map(|i| (query.tokens[*i].fuzz, query.tokens[*i].text.as_str()))
+                    .collect::<Vec<(u8, &str)>>();
+                for (i, matches) in fuzzy.iter().zip(fuzzy_trie.search_many(&queries)) {
+                    expanded[*i] = matches;
+                }
+            }
+        }
+
         for (i, query_token) in query.tokens.iter().enumerate() {
-            for (distance, token) in fuzzy_trie.search(query_token.fuzz, &query_token.text) {
-                if query_token.text != token
+            // repeated query token, reuse already expanded pointers instead of searching trie again
+            if let Some(j) = query.tokens[..i]
+                .iter()
+                .position(|t| t.fuzz == query_token.fuzz && t.text == query_token.text)
+            {
+                pointers[i] = pointers[j].clone();
+                continue;
+            }
+
+            // exact term can only match itself, the same holds for terms not longer than fuzz
+            // because all their non exact matches are discarded below, in both cases
+            // levenshtein automaton trie walk is skipped and term is resolved with hasher lookup
+            let matches =
+                if query_token.fuzz == 0 || query_token.text.len() <= query_token.fuzz as usize {
+                    Arc::new([(0, query_token.text.clone())])
+                } else {
+                    std::mem::take(&mut expanded[i])
+                };
+
+            for (distance, token) in matches.iter() {
+                if query_token.text != *token
                     && (token.len() <= query_token.fuzz as usize
                         || query_token.text.len() <= query_token.fuzz as usize)
                 {
                     continue;
                 }
 
-                let token = match hasher.hash(&token) {
+                let token = match hasher.hash(token) {
                     Some(val) => val,
                     _ => continue,
                 };
@@ -79,9 +137,11 @@ impl<'a> PostingListIntersection<'a> {
                     doc_id: Ulid(postings[0].doc_id),
                     doc_idx: 0,
                     token: token,
-                    distance: distance,
+                    postings: postings,
                     tf: postings[0].positions.len() as u64,
-                    postings_len: postings.len() as u64,
+                    // idf and fuzziness penalty depend only on expanded token, so they
+                    // are folded into single weight once instead of per scored term
+                    weight: token_weight(docs_num, postings.len() as u64, *distance),
                 };
                 pointers[i].push(Reverse(pointer));
             }
@@ -91,37 +151,40 @@ impl<'a> PostingListIntersection<'a> {
             }
         }
 
+        let lead = (0..pointers.len()).min_by_key(|i| {
+            pointers[*i]
+                .iter()
+                .map(|p| p.0.postings.len())
+                .sum::<usize>()
+        })?;
+
         Some(Self {
             query: query,
-            index: index,
             docs: docs,
             pointers: pointers,
+            lead: lead,
         })
     }
 
     fn next_docs(
-        index: &HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>>,
-        pointer: &mut BinaryHeap<Reverse<TokenDocPointer>>,
-    ) -> Vec<TokenDocPointer> {
+        pointer: &mut BinaryHeap<Reverse<TokenDocPointer<'a>>>,
+    ) -> Vec<TokenDocPointer<'a>> {
         let mut doc_ids = Vec::<TokenDocPointer>::new();
 
         while let Some(p) = pointer.peek()
             && (doc_ids.is_empty() || doc_ids[0] == p.0)
         {
             let p = pointer.pop().unwrap();
-            let postings = match index.get(&p.0.token) {
-                Some(postings) => postings,
-                None => continue,
-            };
+            let postings = p.0.postings;
 
             if p.0.doc_idx + 1 <= postings.len() as u32 - 1 {
                 pointer.push(Reverse(TokenDocPointer {
                     doc_id: Ulid(postings[p.0.doc_idx as usize + 1].doc_id),
                     doc_idx: p.0.doc_idx + 1,
                     token: p.0.token.clone(),
-                    distance: p.0.distance,
+                    postings: postings,
                     tf: postings[p.0.doc_idx as usize + 1].positions.len() as u64,
-                    postings_len: postings.len() as u64,
+                    weight: p.0.weight,
                 }))
             }
 
@@ -132,66 +195,48 @@ impl<'a> PostingListIntersection<'a> {
     }
 
     fn geq_docs(
-        index: &HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>>,
-        pointer: &mut BinaryHeap<Reverse<TokenDocPointer>>,
+        pointer: &mut BinaryHeap<Reverse<TokenDocPointer<'a>>>,
         target_doc: &Ulid,
-    ) -> Vec<TokenDocPointer> {
+    ) -> Vec<TokenDocPointer<'a>> {
         while let Some(p) = pointer.peek()
             && p.0.doc_id < *target_doc
         {
             let doc = pointer.pop().unwrap();
-            let postings = match index.get(&doc.0.token) {
-                Some(postings) => postings,
-                None => continue,
-            };
-
-            let new_idx =
-                match postings.binary_search_by(|posting| posting.doc_id.cmp(&target_doc.0)) {
-                    Ok(idx) => idx,
-                    Err(idx) => idx,
-                };
+            let postings = doc.0.postings;
+
+            // postings are sorted by doc id and pointer only moves forward, so target is
+            // galloped to from current posting instead of binary searching whole postings
+            let idx = doc.0.doc_idx as usize;
+            let new_idx = idx + gallop(&postings[idx..], |posting| posting.doc_id < target_doc.0);
 
             if new_idx <= postings.len() - 1 {
                 pointer.push(Reverse(TokenDocPointer {
                     doc_id: Ulid(postings[new_idx].doc_id),
                     doc_idx: new_idx as u32,
                     token: doc.0.token.clone(),
-                    distance: doc.0.distance,
+                    postings: postings,
                     tf: postings[new_idx].positions.len() as u64,
-                    postings_len: postings.len() as u64,
+                    weight: doc.0.weight,
                 }))
             }
         }
 
-        return Self::next_docs(index, pointer);
+        return Self::next_docs(pointer);
     }
 
-    pub fn next(&mut self) -> Option<&Vec<Vec<TokenDocPointer>>> {
-        let mut same = true;
-
-        for i in 0..self.query.tokens.len() {
-            let docs = Self::next_docs(self.index, &mut self.pointers[i]);
-
-            if docs.is_empty() {
-                return None;
-            }
-
-            if self.docs.len() <= i {
-                self.docs.push(docs);
-            } else {
-                self.docs[i] = docs;
-            }
-
-            if i != 0 && self.docs[i][0].doc_id != self.docs[i - 1][0].doc_id {
-                same = false;
-            }
+    pub fn next(&mut self) -> Option<&Vec<Vec<TokenDocPointer<'a>>>> {
+        // token with the fewest postings drives intersection, every common document must
+        // be at or after its next document, so other tokens jump there directly instead of
+        // stepping through documents that would be skipped anyway
+        let docs = Self::next_docs(&mut self.pointers[self.lead]);
+        if docs.is_empty() {
+            return None;
         }
 
-        let mut target_doc = match self.docs.iter().max_by(|x, y| x[0].cmp(&y[0])) {
-            Some(docs) => docs[0].doc_id,
-            None => return None,
-        };
+        let mut target_doc = docs[0].doc_id;
+        self.docs[self.lead] = docs;
 
+        let mut same = false;
         loop {
             if same {
                 return Some(&self.docs);
@@ -199,8 +244,9 @@ impl<'a> PostingListIntersection<'a> {
                 same = true;
                 let cur_target_doc = target_doc.clone();
                 for i in 0..self.query.tokens.len() {
-                    if cur_target_doc != self.docs[i][0].doc_id {
-                        let docs = Self::geq_docs(self.index, &mut self.pointers[i], &target_doc);
+                    // other tokens still hold previous match documents, which are before target
+                    if self.docs[i].is_empty() || cur_target_doc != self.docs[i][0].doc_id {
+                        let docs = Self::geq_docs(&mut self.pointers[i], &target_doc);
 
                         if docs.is_empty() {
                             return None;
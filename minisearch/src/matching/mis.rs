@@ -1,22 +1,21 @@
-use crate::core::index::Posting;
 use crate::matching::intersect::TokenDocPointer;
+use crate::utils::gallop::gallop;
 use core::cmp::{Ordering, Reverse};
-use hashbrown::HashMap;
-use nohash_hasher::BuildNoHashHasher;
 use std::collections::BinaryHeap;
-use std::slice::Iter;
+use std::collections::binary_heap::PeekMut;
 
 struct TokenPositions<'a> {
     token: u32,
-    distance: u16,
     tf: u64,
-    positions: Iter<'a, u32>,
+    weight: f64,
+    positions: &'a [u32],
+    cursor: usize, // index of next not consumed position
 }
 
 struct TokenMeta {
     token: u32,
-    distance: u16,
     tf: u64,
+    weight: f64,
 }
 
 struct TokenPosition {
@@ -49,13 +48,13 @@ pub struct MisTokenIdx {
     pub token: u32,
     pub token_idx: u32,
     pub tf: u64,
-    pub distance: u16,
+    pub weight: f64,
 }
 
 #[derive(Debug)]
-pub struct MisResult {
+pub struct MisResult<'b> {
     pub slop: i32,
-    pub indexes: Vec<MisTokenIdx>,
+    pub indexes: &'b [MisTokenIdx],
 }
 
 struct TokenGroupIterator<'a> {
@@ -68,6 +67,7 @@ pub struct MinimalIntervalSemanticMatch<'a> {
     iterators: Vec<TokenGroupIterator<'a>>,
     window: Vec<u32>, // window of token indexes
     slops: Vec<i32>,
+    indexes: Vec<MisTokenIdx>, // last match indexes, buffer is reused between matches
     end: bool,
 }
 
@@ -79,8 +79,8 @@ impl<'a> TokenGroupIterator<'a> {
         }
     }
 
-    fn add_token_positions(&mut self, mut positions: Iter<'a, u32>, token: u32, distance: u16) {
-        match positions.next() {
+    fn add_token_positions(&mut self, positions: &'a [u32], token: u32, weight: f64) {
+        match positions.first() {
             Some(val) => {
                 self.heap.push(Reverse(TokenPosition {
                     position: *val,
@@ -88,9 +88,10 @@ impl<'a> TokenGroupIterator<'a> {
                 }));
                 self.tokens.push(TokenPositions {
                     token: token,
-                    distance: distance,
-                    tf: positions.len() as u64 + 1,
+                    tf: positions.len() as u64,
+                    weight: weight,
                     positions: positions,
+                    cursor: 1,
                 });
             }
             _ => (),
@@ -98,17 +99,22 @@ impl<'a> TokenGroupIterator<'a> {
     }
 
     fn closest(&mut self, target: u32) -> Option<u32> {
-        while let Some(pos) = self.heap.peek()
+        while let Some(mut pos) = self.heap.peek_mut()
             && pos.0.position <= target
         {
-            let pos = self.heap.pop().unwrap();
-            while let Some(val) = self.tokens[pos.0.idx].positions.next() {
-                if *val > target {
-                    self.heap.push(Reverse(TokenPosition {
-                        position: *val,
-                        idx: pos.0.idx,
-                    }));
-                    break;
+            let token = &mut self.tokens[pos.0.idx];
+
+            // cursor mostly moves by few positions at a time, so next position greater than
+            // target is galloped to instead of binary searching all remaining positions
+            token.cursor += gallop(&token.positions[token.cursor..], |val| *val <= target);
+            match token.positions.get(token.cursor) {
+                Some(val) => {
+                    // advance token in place, heap is sifted once when pos is dropped
+                    token.cursor += 1;
+                    pos.0.position = *val;
+                }
+                None => {
+                    PeekMut::pop(pos);
                 }
             }
         }
@@ -117,12 +123,16 @@ impl<'a> TokenGroupIterator<'a> {
     }
 
     fn next(&mut self) -> Option<u32> {
-        if let Some(pos) = self.heap.pop() {
-            if let Some(val) = self.tokens[pos.0.idx].positions.next() {
-                self.heap.push(Reverse(TokenPosition {
-                    position: *val,
-                    idx: pos.0.idx,
-                }));
+        if let Some(mut pos) = self.heap.peek_mut() {
+            let token = &mut self.tokens[pos.0.idx];
+            match token.positions.get(token.cursor) {
+                Some(val) => {
+                    token.cursor += 1;
+                    pos.0.position = *val;
+                }
+                None => {
+                    PeekMut::pop(pos);
+                }
             }
         }
 
@@ -142,8 +152,8 @@ impl<'a> TokenGroupIterator<'a> {
             let token = &self.tokens[pos.0.idx];
             return Some(TokenMeta {
                 token: token.token.clone(),
-                distance: token.distance,
                 tf: token.tf,
+                weight: token.weight,
             });
         }
 
@@ -152,21 +162,16 @@ impl<'a> TokenGroupIterator<'a> {
 }
 
 impl<'a> MinimalIntervalSemanticMatch<'a> {
-    pub fn new(
-        index: &'a HashMap<u32, Vec<Posting>, BuildNoHashHasher<u32>>,
-        pointers: &Vec<Vec<TokenDocPointer>>,
-        min_slop: i32,
-    ) -> Self {
+    pub fn new(pointers: &Vec<Vec<TokenDocPointer<'a>>>, min_slop: i32) -> Self {
         let mut iterators: Vec<TokenGroupIterator> = Vec::with_capacity(pointers.len());
         for group in pointers {
             let mut iterator = TokenGroupIterator::new();
             for pointer in group {
-                let positions = match index.get(&pointer.token) {
-                    Some(postings) => postings[pointer.doc_idx as usize].positions.iter(),
-                    None => continue,
-                };
-
-                iterator.add_token_positions(positions, pointer.token, pointer.distance);
+                iterator.add_token_positions(
+                    &pointer.postings[pointer.doc_idx as usize].positions,
+                    pointer.token,
+                    pointer.weight,
+                );
             }
 
             iterators.push(iterator);
@@ -190,15 +195,12 @@ impl<'a> MinimalIntervalSemanticMatch<'a> {
             iterators: iterators,
             window: window,
             slops: slops,
+            indexes: Vec::with_capacity(pointers.len()),
             end: end,
         }
     }
-}
-
-impl<'a> Iterator for MinimalIntervalSemanticMatch<'a> {
-    type Item = MisResult;
 
-    fn next(&mut self) -> Option<MisResult> {
+    pub fn next_match(&mut self) -> Option<MisResult<'_>> {
         let mut idx = 1;
         while !self.end {
             while idx <= self.iterators.len() - 1 {
@@ -221,32 +223,27 @@ impl<'a> Iterator for MinimalIntervalSemanticMatch<'a> {
 
             let mut result = None;
             if idx == self.iterators.len() {
-                let mut window = Vec::with_capacity(self.window.len());
+                // build result indexes directly, without intermediate tuples window
+                self.indexes.clear();
                 for (iter_idx, token_idx) in self.window.iter().enumerate() {
                     let meta = match self.iterators[iter_idx].last_meta() {
                         Some(meta) => meta,
                         None => break,
                     };
 
-                    window.push((*token_idx, meta.token, meta.tf, meta.distance));
+                    self.indexes.push(MisTokenIdx {
+                        token: meta.token,
+                        token_idx: *token_idx,
+                        tf: meta.tf,
+                        weight: meta.weight,
+                    });
                 }
 
-                if window.len() < self.window.len() {
+                if self.indexes.len() < self.window.len() {
                     break;
                 }
 
-                let _ = result.insert(MisResult {
-                    slop: self.slops[self.iterators.len() - 1],
-                    indexes: window
-                        .into_iter()
-                        .map(|(token_idx, token, tf, distance)| MisTokenIdx {
-                            token: token,
-                            token_idx: token_idx,
-                            tf: tf,
-                            distance: distance,
-                        })
-                        .collect::<Vec<MisTokenIdx>>(),
-                });
+                let _ = result.insert(self.slops[self.iterators.len() - 1]);
             }
 
             match self.iterators[0].next() {
@@ -257,8 +254,11 @@ impl<'a> Iterator for MinimalIntervalSemanticMatch<'a> {
                 None => self.end = true,
             };
 
-            if result.is_some() {
-                return result;
+            if let Some(slop) = result {
+                return Some(MisResult {
+                    slop: slop,
+                    indexes: &self.indexes,
+                });
             }
         }
 
@@ -23,6 +23,23 @@ pub struct Query<'a> {
 impl<'a> Query<'a> {
     pub fn parse(query: &'a mut str) -> Result<Query<'a>, PyErr> {
         query.make_ascii_lowercase();
+        let query: &'a str = query;
+
+        // plain terms without fuzziness or phrase don't need the parser, leading
+        // whitespace is still left to the parser since it rejects it
+        if !query.contains(['~', '"']) && query.starts_with(|c: char| !c.is_whitespace()) {
+            return Ok(Query {
+                terms: query
+                    .split_whitespace()
+                    .map(|text| Term {
+                        text: text,
+                        fuzz: 0,
+                    })
+                    .collect(),
+                slop: 0,
+            });
+        }
+
         let result = Self::parser().parse(query);
         if result.has_errors() {
             let errors = result
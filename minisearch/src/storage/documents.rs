@@ -89,19 +89,11 @@ impl Document {
             tokens: tokens,
         }
     }
-}
-
-#[pymethods]
-impl Document {
-    #[getter(id)]
-    pub fn id(&self) -> PyResult<String> {
-        Ok(Ulid::from_bytes(self.id).to_string())
-    }
 
-    #[getter(content)]
-    pub fn content(&mut self) -> PyResult<String> {
-        let content = match &self.data {
-            Some(val) => val.clone(),
+    // content is read from segment on first access and kept in document afterwards
+    fn load_content(&mut self) -> PyResult<&str> {
+        let content = match self.data.take() {
+            Some(val) => val,
             None => {
                 let DocLocation {
                     segment,
@@ -121,13 +113,41 @@ impl Document {
                         )));
                     }
                 };
-                let data = String::from_utf8(data)?;
-                self.data.replace(data.clone());
-                data
+                String::from_utf8(data)?
             }
         };
 
-        Ok(content)
+        Ok(self.data.insert(content).as_str())
+    }
+
+    // python reads only id and content, so documents handed to it don't copy tokens
+    pub fn to_py(&self) -> Self {
+        Self {
+            id: self.id,
+            data: self.data.clone(),
+            location: self.location.clone(),
+            len: self.len,
+            tokens: Vec::new(),
+        }
+    }
+}
+
+#[pymethods]
+impl Document {
+    #[getter(id)]
+    pub fn id(&self) -> PyResult<String> {
+        Ok(Ulid::from_bytes(self.id).to_string())
+    }
+
+    #[getter(content)]
+    pub fn content(&mut self) -> PyResult<String> {
+        Ok(self.load_content()?.to_string())
+    }
+
+    // only first n characters are copied, so callers that need a prefix don't clone
+    // whole document
+    pub fn content_prefix(&mut self, n: usize) -> PyResult<String> {
+        Ok(self.load_content()?.chars().take(n).collect())
     }
 }
 
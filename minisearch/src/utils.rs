@@ -1,4 +1,5 @@
 pub mod automaton;
 pub mod fileext;
+pub mod gallop;
 pub mod hasher;
 pub mod trie;
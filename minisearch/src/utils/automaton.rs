@@ -1,4 +1,4 @@
-use hashbrown::HashMap;
+use hashbrown::{HashMap, HashSet};
 use nohash_hasher::BuildNoHashHasher;
 use std::cmp;
 use std::sync::Arc;
@@ -7,6 +7,7 @@ use std::vec::Vec;
 #[derive(Eq, PartialEq, Ord, PartialOrd, Clone, Hash)]
 struct State(u32, i32);
 
+#[derive(Clone)]
 pub struct LevenshteinDfaState {
     offset: u32,
     max_shift: u32,
@@ -14,12 +15,11 @@ pub struct LevenshteinDfaState {
 }
 
 struct LevenshteinDfa {
-    dfa: HashMap<
-        u32,
-        HashMap<u32, LevenshteinDfaState, BuildNoHashHasher<u32>>,
-        BuildNoHashHasher<u32>,
-    >,
-    states: HashMap<u32, Vec<State>, BuildNoHashHasher<u32>>,
+    // dense transitions table, transition for state id and characteristic vector
+    // mask is stored at index state_id * vectors_num + mask
+    transitions: Vec<LevenshteinDfaState>,
+    vectors_num: usize,
+    states: Vec<Vec<State>>, // states vector for each state id
 }
 
 pub struct LevenshteinAutomaton {
@@ -82,9 +82,31 @@ impl LevenshteinDfa {
             states_map.insert(state_id, states);
         }
 
+        // state ids are assigned sequentially, so maps can be flattened into tables indexed by id
+        let vectors_num = char_vectors.len();
+        let mut transitions = vec![
+            LevenshteinDfaState {
+                offset: 0,
+                max_shift: 0,
+                state_id: 0,
+            };
+            dfa.len() * vectors_num
+        ];
+        for (state_id, state_transitions) in dfa {
+            for (mask, state) in state_transitions {
+                transitions[state_id as usize * vectors_num + mask as usize] = state;
+            }
+        }
+
+        let mut states = vec![Vec::new(); states_map.len()];
+        for (state_id, state) in states_map {
+            states[state_id as usize] = state;
+        }
+
         Self {
-            dfa: dfa,
-            states: states_map,
+            transitions: transitions,
+            vectors_num: vectors_num,
+            states: states,
         }
     }
 
@@ -107,23 +129,17 @@ impl LevenshteinDfa {
 
     fn get_characteristic_vectors(width: u8) -> Vec<Vec<u8>> {
         // Return all characteristic vectors of width 'width'
-
-        fn create(vectors: Vec<Vec<u8>>, depth: u8, max: u8) -> Vec<Vec<u8>> {
-            if depth == max {
-                return vectors;
-            }
-
-            let mut new_vectors: Vec<Vec<u8>> = Vec::new();
-            for v in vectors.into_iter() {
-                new_vectors.push(v.clone().into_iter().chain(vec![1]).collect());
-                new_vectors.push(v.into_iter().chain(vec![0]).collect());
-            }
-
-            create(new_vectors, depth + 1, max)
-        }
-
-        let vectors = vec![vec![1], vec![0]];
-        create(vectors, 1, width)
+        // each vector is binary representation of number from range 2^width - 1 down to 0,
+        // built directly instead of extending (and cloning) all prefixes at every depth
+
+        (0..1u32 << width)
+            .rev()
+            .map(|mask| {
+                (0..width)
+                    .map(|i| ((mask >> (width - 1 - i)) & 1) as u8)
+                    .collect()
+            })
+            .collect()
     }
 
     fn transitions(vector: &Vec<u8>, state: &State) -> Vec<State> {
@@ -152,10 +168,12 @@ impl LevenshteinDfa {
         // Perform step from 'states' step for specifiec characteristic vector
 
         let mut next_states: Vec<State> = Vec::new();
+        // tracks already added states, avoids linear scan of 'next_states' for every transition
+        let mut seen: HashSet<State> = HashSet::new();
 
         for s in states.iter() {
             for state in Self::transitions(&vector, &s) {
-                if state.1 >= 0 && !next_states.contains(&state) {
+                if state.1 >= 0 && seen.insert(state.clone()) {
                     next_states.push(state);
                 }
             }
@@ -279,18 +297,15 @@ impl LevenshteinAutomaton {
         // performs single automaton step
         let vec = self.get_characteristic_vector(c, state.offset);
 
-        match self.dfa.as_ref().dfa.get(&state.state_id) {
-            Some(transitions) => match transitions.get(&vec) {
-                Some(next_state) => LevenshteinDfaState {
-                    offset: state.offset + next_state.offset,
-                    max_shift: next_state.max_shift,
-                    state_id: next_state.state_id,
-                },
-                None => LevenshteinDfaState {
-                    offset: 0,
-                    max_shift: 0,
-                    state_id: 0,
-                },
+        let dfa = self.dfa.as_ref();
+        match dfa
+            .transitions
+            .get(state.state_id as usize * dfa.vectors_num + vec as usize)
+        {
+            Some(next_state) => LevenshteinDfaState {
+                offset: state.offset + next_state.offset,
+                max_shift: next_state.max_shift,
+                state_id: next_state.state_id,
             },
             _ => LevenshteinDfaState {
                 offset: 0,
@@ -309,7 +324,7 @@ impl LevenshteinAutomaton {
     }
 
     pub fn distance(&self, state: &LevenshteinDfaState) -> u16 {
-        match self.dfa.as_ref().states.get(&state.state_id) {
+        match self.dfa.as_ref().states.get(state.state_id as usize) {
             Some(states) => {
                 states
                     .iter()
@@ -0,0 +1,15 @@
+use std::cmp::min;
+
+pub fn gallop<T, P: Fn(&T) -> bool>(items: &[T], pred: P) -> usize {
+    // same as slice partition_point, returns number of leading items for which 'pred' holds,
+    // but bounds the result exponentially from the start, so the search cost is proportional
+    // to the distance to the partition point instead of the whole slice length
+
+    let mut bound = 1;
+    while bound <= items.len() && pred(&items[bound - 1]) {
+        bound <<= 1;
+    }
+
+    let (lo, hi) = (bound >> 1, min(bound - 1, items.len()));
+    lo + items[lo..hi].partition_point(pred)
+}
@@ -8,19 +8,26 @@ use std::{
 };
 
 use bincode::{Decode, Encode};
+use hashbrown::DefaultHashBuilder;
 use std::collections::HashMap;
 
 use crate::{config::Config, errors::BincodePersistenceError};
 
 #[derive(Decode, Encode, PartialEq, Debug, Clone)]
 struct TokensStore {
-    map: HashMap<String, u32>,
+    // token strings are hashed on every indexed and queried token, default SipHash is
+    // replaced with faster hasher, encoded format doesn't depend on hasher
+    map: HashMap<String, u32, DefaultHashBuilder>,
     tokens: Vec<Option<String>>,
     deleted: Vec<u32>,
 }
 
 impl TokensStore {
-    fn new(map: HashMap<String, u32>, tokens: Vec<Option<String>>, deleted: Vec<u32>) -> Self {
+    fn new(
+        map: HashMap<String, u32, DefaultHashBuilder>,
+        tokens: Vec<Option<String>>,
+        deleted: Vec<u32>,
+    ) -> Self {
         Self {
             map: map,
             tokens: tokens,
@@ -31,20 +38,20 @@ impl TokensStore {
     fn load(path: &PathBuf) -> Result<Self, io::Error> {
         if !fs::exists(path)? {
             File::create(path)?;
-            return Ok(Self::new(HashMap::new(), Vec::new(), Vec::new()));
+            return Ok(Self::new(HashMap::default(), Vec::new(), Vec::new()));
         }
 
         let mut file = File::open(path)?;
         // if file is empty don't try to decode tokens
         if file.metadata()?.len() == 0 {
-            return Ok(Self::new(HashMap::new(), Vec::new(), Vec::new()));
+            return Ok(Self::new(HashMap::default(), Vec::new(), Vec::new()));
         }
 
         match bincode::decode_from_std_read(&mut file, bincode::config::standard()) {
             Ok(store) => Ok(store),
             Err(e) => {
                 println!("Warning tokens decode error: {e}");
-                Ok(Self::new(HashMap::new(), Vec::new(), Vec::new()))
+                Ok(Self::new(HashMap::default(), Vec::new(), Vec::new()))
             }
         }
     }
@@ -1,16 +1,40 @@
 use crate::utils::automaton::{
     LevenshteinAutomaton, LevenshteinAutomatonBuilder, LevenshteinDfaState,
 };
-use std::collections::HashMap;
+use hashbrown::{Equivalent, HashMap};
+use std::sync::Arc;
 
 struct Node {
     is_word: bool,
     nodes: Vec<(char, Node)>,
 }
 
+#[derive(PartialEq, Eq, Hash)]
+struct CacheKey {
+    distance: u8,
+    query: String,
+}
+
+// borrowed form of cache key, hashes the same way, so lookups don't allocate query
+#[derive(Hash)]
+struct CacheKeyRef<'a> {
+    distance: u8,
+    query: &'a str,
+}
+
+impl Equivalent<CacheKey> for CacheKeyRef<'_> {
+    fn equivalent(&self, key: &CacheKey) -> bool {
+        self.distance == key.distance && self.query == key.query
+    }
+}
+
 pub struct Trie {
     automaton_builders: HashMap<u8, LevenshteinAutomatonBuilder>,
     nodes: Vec<(char, Node)>,
+    // search results cache, valid until trie words change
+    // matches are shared, so cache hits don't copy expanded words
+    cache: HashMap<CacheKey, Arc<[(u16, String)]>>,
+    cache_size: usize,
 }
 
 impl Node {
@@ -23,10 +47,12 @@ impl Node {
 }
 
 impl Trie {
-    pub fn new() -> Self {
+    pub fn new(cache_size: usize) -> Self {
         Self {
             automaton_builders: HashMap::new(),
             nodes: Vec::new(),
+            cache: HashMap::new(),
+            cache_size: cache_size,
         }
     }
 
@@ -36,6 +62,10 @@ impl Trie {
     }
 
     pub fn add(&mut self, word: &str) {
+        if !self.cache.is_empty() {
+            self.cache.clear();
+        }
+
         let mut nodes = &mut self.nodes;
         let len = word.chars().count();
 
@@ -57,11 +87,85 @@ impl Trie {
     }
 
     pub fn delete(&mut self, word: String) {
+        if !self.cache.is_empty() {
+            self.cache.clear();
+        }
+
         let mut chars: Vec<char> = word.chars().rev().collect();
         Self::_delete(&mut chars, &mut self.nodes);
     }
 
-    pub fn search(&self, d: u8, query: &str) -> Vec<(u16, String)> {
+    pub fn search(&mut self, d: u8, query: &str) -> Arc<[(u16, String)]> {
+        if let Some(matches) = self.cache.get(&CacheKeyRef {
+            distance: d,
+            query: query,
+        }) {
+            return Arc::clone(matches);
+        }
+
+        let matches = self._search_automaton(d, query);
+        self.cache_insert(d, query, matches)
+    }
+
+    pub fn search_many(&mut self, queries: &[(u8, &str)]) -> Vec<Arc<[(u16, String)]>> {
+        // only queries missing in cache are expanded with trie walk
+        let mut results = vec![None; queries.len()];
+        let mut missing = Vec::new();
+        for (i, (d, query)) in queries.iter().enumerate() {
+            match self.cache.get(&CacheKeyRef {
+                distance: *d,
+                query: query,
+            }) {
+                Some(matches) => results[i] = Some(Arc::clone(matches)),
+                None => missing.push(i),
+            }
+        }
+
+        let missing_queries = missing
+            .iter()
+            .map(|i| queries[*i])
+            .collect::<Vec<(u8, &str)>>();
+        let matches = match missing_queries.len() {
+            0 => vec![],
+            1 => vec![self._search_automaton(missing_queries[0].0, missing_queries[0].1)],
+            _ => self._search_many_automatons(&missing_queries),
+        };
+
+        for (i, matches) in missing.into_iter().zip(matches) {
+            results[i] = Some(self.cache_insert(queries[i].0, queries[i].1, matches));
+        }
+
+        results.into_iter().map(|r| r.unwrap_or_default()).collect()
+    }
+}
+
+impl Trie {
+    fn cache_insert(
+        &mut self,
+        d: u8,
+        query: &str,
+        matches: Vec<(u16, String)>,
+    ) -> Arc<[(u16, String)]> {
+        let matches: Arc<[(u16, String)]> = matches.into();
+        if self.cache.len() >= self.cache_size {
+            // simple bounded cache, start over once it is full
+            self.cache.clear();
+        }
+
+        if self.cache_size > 0 {
+            self.cache.insert(
+                CacheKey {
+                    distance: d,
+                    query: query.to_string(),
+                },
+                Arc::clone(&matches),
+            );
+        }
+
+        matches
+    }
+
+    fn _search_automaton(&self, d: u8, query: &str) -> Vec<(u16, String)> {
         match self.automaton_builders.get(&d) {
             Some(builder) => {
                 let mut automaton = builder.get(query);
@@ -80,9 +184,37 @@ impl Trie {
             None => vec![],
         }
     }
-}
 
-impl Trie {
+    fn _search_many_automatons(&self, queries: &[(u8, &str)]) -> Vec<Vec<(u16, String)>> {
+        // expands all queries in single trie walk, branch is visited once as long as
+        // at least one of queries automatons can still match it
+        let mut automatons = Vec::with_capacity(queries.len());
+        let mut states = Vec::with_capacity(queries.len());
+        for (d, query) in queries {
+            match self.automaton_builders.get(d) {
+                Some(builder) => {
+                    let automaton = builder.get(query);
+                    states.push(Some(automaton.initial_state()));
+                    automatons.push(Some(automaton));
+                }
+                None => {
+                    states.push(None);
+                    automatons.push(None);
+                }
+            }
+        }
+
+        let mut prefix = String::new();
+        let mut matches = vec![Vec::new(); queries.len()];
+        self._search_many(
+            &mut prefix,
+            &mut matches,
+            &self.nodes,
+            &states,
+            &mut automatons,
+        );
+        matches
+    }
     fn _delete(chars: &mut Vec<char>, nodes: &mut Vec<(char, Node)>) -> (usize, bool, bool) {
         if chars.len() == 0 {
             return (0, false, true);
@@ -135,4 +267,51 @@ impl Trie {
             prefix.pop();
         }
     }
+
+    fn _search_many(
+        &self,
+        prefix: &mut String,
+        matches: &mut Vec<Vec<(u16, String)>>,
+        nodes: &Vec<(char, Node)>,
+        states: &Vec<Option<LevenshteinDfaState>>,
+        automatons: &mut Vec<Option<LevenshteinAutomaton>>,
+    ) {
+        for (c, node) in nodes.iter() {
+            let mut can_match = false;
+            let new_states = states
+                .iter()
+                .zip(automatons.iter_mut())
+                .map(|(state, automaton)| match (state, automaton) {
+                    (Some(state), Some(automaton)) => {
+                        let new_state = automaton.step(*c, state);
+                        if !automaton.can_match(&new_state) {
+                            return None;
+                        }
+
+                        can_match = true;
+                        Some(new_state)
+                    }
+                    _ => None,
+                })
+                .collect::<Vec<Option<LevenshteinDfaState>>>();
+
+            if !can_match {
+                continue;
+            }
+
+            prefix.push(*c);
+            if node.is_word {
+                for (i, state) in new_states.iter().enumerate() {
+                    if let (Some(state), Some(automaton)) = (state, &automatons[i])
+                        && automaton.is_match(state)
+                    {
+                        matches[i].push((automaton.distance(state), prefix.clone()));
+                    }
+                }
+            }
+
+            self._search_many(prefix, matches, &node.nodes, &new_states, automatons);
+            prefix.pop();
+        }
+    }
 }
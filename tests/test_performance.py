@@ -1,67 +1,162 @@
-import json
+import os
+import math
+import shutil
 import timeit
 import pytest
+import functools
 import statistics
+from time import perf_counter_ns
+import minisearch.rust
 from minisearch import MiniSearch
 
+# orjson parses large corpus noticeably faster, fall back to json if it isn't installed
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
 
-@pytest.fixture
+# every query is timed in few rounds and median is reported, single shot is too noisy
+QUERY_ROUNDS = 3
+NS_PER_S = 1_000_000_000
+ARTICLES = "tests/assets/articles_50k.json"
+# fuzzy and query caches are disabled, otherwise every timed search after warm up
+# would be a cache hit and fuzzy expansion and parsing wouldn't be measured
+CONF = "tests/assets/perf_conf.toml"
+
+
+@pytest.fixture(scope="session")
 def data():
-    with open("tests/assets/articles_50k.json", "r+") as f:
-        data = json.load(f)
+    with open(ARTICLES, "rb") as f:
+        data = loads(f.read())
 
-    return data.values()
+    # only articles are kept, values view would keep whole dict with its keys alive
+    return list(data.values())
 
 
 @pytest.fixture
 def queries():
-    queries = []
+    # queries are lowercased and split into tokens once
     with open("tests/assets/queries.txt", "r+") as f:
-        for q in f.readlines():
-            queries.append(q.strip())
+        return [tuple(q.strip().lower().split()) for q in f]
+
+
+def percentile(sorted_times, p):
+    # nearest rank percentile, times have to be already sorted
+    return sorted_times[max(0, math.ceil(p / 100 * len(sorted_times)) - 1)]
+
+
+@functools.lru_cache(maxsize=None)
+def rust_query(tokens, fuzzy, slop):
+    return '"' + " ".join(f"{t}~{fuzzy}" for t in tokens) + f'"~{slop}'
 
-    return queries
 
+@pytest.fixture(scope="session")
+def index(request, pytestconfig, tmp_path_factory):
+    # by default index is built and insertion timed on every run, with
+    # MINISEARCH_REUSE_INDEX=1 built index is persisted in pytest cache and reused by
+    # next runs that only time searches
+    reuse = os.environ.get("MINISEARCH_REUSE_INDEX") == "1"
+    if not reuse or getattr(pytestconfig, "cache", None) is None:
+        return build_index(request, tmp_path_factory.mktemp("index"))
 
-def rust_query(query, fuzzy, slop):
-    return '"' + " ".join([f"{t}~{fuzzy}" for t in query.lower().split()]) + f'"~{slop}'
+    # directory is keyed by corpus and by installed extension, so index built by older
+    # build of minisearch or from changed corpus is never reused
+    key = "_".join(
+        f"{stat.st_size}_{stat.st_mtime_ns}"
+        for stat in (os.stat(ARTICLES), os.stat(minisearch.rust.__file__))
+    )
+    dir = pytestconfig.cache.mkdir(f"minisearch_index_{key}")
 
+    # indexes persisted for other keys are stale and never used again
+    for stale in dir.parent.glob("minisearch_index_*"):
+        if stale != dir:
+            shutil.rmtree(stale)
 
-def test_performance(data, queries):
+    if (dir / "built").exists():
+        s = perf_counter_ns()
+        _, index = MiniSearch().add("wikipedia", str(dir), CONF)
+        print(f"\nLOADING TIME OF PERSISTED INDEX: {(perf_counter_ns() - s) / NS_PER_S}")
+        return index
 
-    search = MiniSearch()
-    _, index = search.add("wikipedia", "data")
+    # index left by interrupted run is incomplete, so it is built from scratch
+    shutil.rmtree(dir)
+    index = build_index(request, dir)
+    (dir / "built").touch()
+    return index
+
+
+def build_index(request, dir):
+    data = request.getfixturevalue("data")
+    _, index = MiniSearch().add("wikipedia", str(dir), CONF)
 
     def insert_articles(data, index):
         def _wrapper():
+            # documents are added in single batch call within one session, which
+            # is flushed once on exit
             with index.session():
-                for d in data:
-                    index.add(d)
+                index.add_many(data)
 
         return _wrapper
 
     _time = timeit.timeit(insert_articles(data, index), number=1)
     print(f"\nINSERTION TIME OF {len(data)} ARTICLES: {_time}")
 
-    def time_queries(slop, fuzzy, score):
-        print(f"QUERIES TIME: slop: {slop}, fuzzy: {fuzzy}, score: {score}")
-
-        times = []
-
-        for q in queries:
-            times.append(
-                timeit.timeit(
-                    lambda: index.search(rust_query(q, fuzzy, slop), top_k=0),
-                    number=1,
-                )
-            )
-
-        print(f"FULL TIME: {sum(times)}")
-        print(f"MIN TIME: {min(times)}")
-        print(f"MAX TIME: {max(times)}")
-        print(f"AVG TIME: {statistics.mean(times)}\n")
-
-    for slop in range(0, 4):
-        for fuzzy in range(0, 3):
-            time_queries(slop=slop, fuzzy=fuzzy, score=True)
-            time_queries(slop=slop, fuzzy=fuzzy, score=False)
+    return index
+
+
+def test_performance(index, queries):
+
+    def time_queries(slop, fuzzy, score, top_k):
+        print(
+            f"QUERIES TIME: slop: {slop}, fuzzy: {fuzzy}, score: {score}, top-k: {top_k}"
+        )
+
+        # query strings are built once before timing, only search is measured
+        prepared = [rust_query(q, fuzzy, slop) for q in queries]
+        search = index.search
+
+        # first pass is timed separately, it includes one time costs like faulting in
+        # documents pages or filling stems cache, which aren't part of following timings
+        start = perf_counter_ns()
+        for query in prepared:
+            search(query, top_k=top_k)
+        print(f"COLD FULL TIME: {(perf_counter_ns() - start) / NS_PER_S}")
+
+        # searches are timed with perf_counter_ns directly, timeit adds its own overhead
+        # to every single shot measurement, times are converted to seconds only when printed
+        times, rounds = [0] * len(prepared), [0] * QUERY_ROUNDS
+        for i, query in enumerate(prepared):
+            for r in range(QUERY_ROUNDS):
+                start = perf_counter_ns()
+                search(query, top_k=top_k)
+                rounds[r] = perf_counter_ns() - start
+
+            times[i] = statistics.median(rounds)
+
+        # times are sorted once, min, max and percentiles are then read by index
+        times.sort()
+        full_time = sum(times)
+
+        print(f"FULL TIME: {full_time / NS_PER_S}")
+        print(f"MIN TIME: {times[0] / NS_PER_S}")
+        print(f"MAX TIME: {times[-1] / NS_PER_S}")
+        print(f"AVG TIME: {full_time / len(times) / NS_PER_S}")
+        print(
+            "P50/P95/P99 TIME: "
+            + "/".join(str(percentile(times, p) / NS_PER_S) for p in (50, 95, 99))
+        )
+
+        batch_time = timeit.timeit(
+            lambda: index.search_many(prepared, top_k=top_k),
+            number=1,
+        )
+        print(f"BATCH TIME: {batch_time}\n")
+
+    # sweep is sequential on purpose, search holds the GIL and mutably borrows the index
+    # (fuzzy cache), so thread pool would only serialize calls and skew timings
+    # top-k 0 returns every match, small top-k exercises max score pruning of heap
+    for top_k in (0, 10, 100):
+        for slop in range(0, 4):
+            for fuzzy in range(0, 3):
+                time_queries(slop=slop, fuzzy=fuzzy, score=True, top_k=top_k)
+                time_queries(slop=slop, fuzzy=fuzzy, score=False, top_k=top_k)
@@ -1,47 +1,74 @@
 import os
 import time
 import json
+import pickle
 import shutil
 import pytest
+import threading
+import functools
 from minisearch import MiniSearch
 
-MINISEARCH_DIR = "data"
+# every pytest-xdist worker gets its own index directory, so tests can run in parallel
+MINISEARCH_DIR = "data" + (
+    f"_{os.environ['PYTEST_XDIST_WORKER']}" if "PYTEST_XDIST_WORKER" in os.environ else ""
+)
+
+
+NS_PER_S = 1_000_000_000
+# bump whenever format of parsed expected results changes, so stale pickles aren't loaded
+RESULTS_CACHE_VERSION = 1
 
 
 # helper functions
-def rust_query(query, fuzzy, slop):
-    return '"' + " ".join([f"{t}~{fuzzy}" for t in query.lower().split()]) + f'"~{slop}'
+def rust_query(tokens, fuzzy, slop):
+    return '"' + " ".join(f"{t}~{fuzzy}" for t in tokens) + f'"~{slop}'
 
 
-def validate_results(index, queries, _results, slop, fuzzy, top_k):
+def validate_results(index, queries, formatted_queries, _results, slop, fuzzy, top_k):
 
     results = _results[f"slop_{slop}_fuzzy_{fuzzy}_top_k_{top_k}"]
 
-    for q in queries:
-        query_results = []
-        for res in index.search(rust_query(q, fuzzy, slop), top_k=top_k):
+    search = index.search
+    for q, formatted_query in zip(queries, formatted_queries):
+        query_results = set()
+        for res in search(formatted_query, top_k=top_k):
 
-            r = res.document.content[:100]
+            r = res.content_prefix(100)
 
             assert r in results.get(
-                q, []
+                q, ()
             ), f"Slop: {slop}, fuzzy: {fuzzy}, top-k: {top_k} Result: {r} was returned for query: {q} but isn't present in defined results"
 
-            query_results.append(r)
+            query_results.add(r)
 
-        for r in results.get(q, []):
+        for r in results.get(q, ()):
             assert (
                 r in query_results
             ), f"Slop: {slop}, fuzzy: {fuzzy}, top-k: {top_k} Result: {r} for query: {q} is missing"
 
 
 def validate_all_results(top_ks, slops, fuzzies, index, queries, results):
+    # duplicate queries are searched and validated once
+    queries = list(dict.fromkeys(queries))
+
+    # queries are split into tokens once, query strings don't depend on top_k, so
+    # they are built once per slop and fuzzy
+    tokens = [q.lower().split() for q in queries]
+    formatted_queries = {
+        (slop, fuzzy): [rust_query(t, fuzzy, slop) for t in tokens]
+        for slop in slops
+        for fuzzy in fuzzies
+    }
+
+    # every query string is searched once per top-k, so all but first search of it
+    # go through engine's parsed queries cache
     for top_k in top_ks:
         for slop in slops:
             for fuzzy in fuzzies:
                 validate_results(
                     index,
                     queries,
+                    formatted_queries[(slop, fuzzy)],
                     results,
                     slop=slop,
                     fuzzy=fuzzy,
@@ -49,7 +76,8 @@ def validate_all_results(top_ks, slops, fuzzies, index, queries, results):
                 )
 
 
-@pytest.fixture
+# assets are only read by tests, so they are loaded once per session
+@pytest.fixture(scope="session")
 def queries():
     queries = []
     with open("tests/assets/queries.txt", "r+") as f:
@@ -59,8 +87,9 @@ def queries():
     return queries
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def data():
+    @functools.lru_cache(maxsize=None)
     def func(dir_name):
         files = {
             "test_deletes": ["articles.json", "deletes.json"],
@@ -79,29 +108,78 @@ def data():
     return func
 
 
-@pytest.fixture
-def results():
+@pytest.fixture(scope="session")
+def results(pytestconfig):
+    @functools.lru_cache(maxsize=None)
     def func(dir_name):
         files = {
             "test_deletes": "results.json",
             "test_regular": "results.json",
         }
 
-        file = files[dir_name]
-        with open(f"tests/assets/{dir_name}/{file}", "r+") as f:
+        file = f"tests/assets/{dir_name}/{files[dir_name]}"
+
+        # parsed results are pickled into pytest cache, pickle loads much faster than
+        # json, cache is rebuilt whenever json file or format of parsed results changes,
+        # without cache provider (-p no:cacheprovider) json is parsed every time
+        cache = None
+        if getattr(pytestconfig, "cache", None) is not None:
+            cache = pytestconfig.cache.mkdir("minisearch") / (
+                f"{dir_name}_results_v{RESULTS_CACHE_VERSION}.pickle"
+            )
+
+        if (
+            cache is not None
+            and cache.exists()
+            and cache.stat().st_mtime >= os.stat(file).st_mtime
+        ):
+            with open(cache, "rb") as f:
+                return pickle.load(f)
+
+        with open(file, "r+") as f:
             data = json.load(f)
 
+        # expected results are only checked for membership, so they are kept in sets
+        data = {
+            key: {q: frozenset(query_results) for q, query_results in value.items()}
+            for key, value in data.items()
+        }
+
+        if cache is not None:
+            # written under unique name first, so parallel workers never read partial file
+            tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache)
+
         return data
 
     return func
 
 
+@pytest.fixture(scope="session")
+def cleanup_threads():
+    threads = []
+    yield threads
+
+    # leftover directories are removed before session ends
+    for thread in threads:
+        thread.join()
+
+
 #  after each test cleanup
 @pytest.fixture(autouse=True)
-def cleanup():
+def cleanup(cleanup_threads):
     yield
     if os.path.exists(MINISEARCH_DIR):
-        shutil.rmtree(MINISEARCH_DIR)
+        # directory is moved out of the way, so next test can start right away,
+        # and is deleted in background thread
+        trash = f"{MINISEARCH_DIR}.trash.{os.getpid()}.{len(cleanup_threads)}"
+        os.rename(MINISEARCH_DIR, trash)
+
+        thread = threading.Thread(target=shutil.rmtree, args=(trash,), daemon=True)
+        thread.start()
+        cleanup_threads.append(thread)
 
 
 def test_search(subtests, data, queries, results):
@@ -110,16 +188,16 @@ def test_search(subtests, data, queries, results):
         data, results = data("test_regular"), results("test_regular")
 
         search = MiniSearch()
-        s = time.time()
+        s = time.perf_counter_ns()
         _, index = search.add("wikipedia", MINISEARCH_DIR)
-        print(f"Loading took: {time.time() - s}")
+        print(f"Loading took: {(time.perf_counter_ns() - s) / NS_PER_S}")
 
-        s = time.time()
+        s = time.perf_counter_ns()
         with index.session():
             for d in data:
                 index.add(d)
 
-        print(f"Inserting took: {time.time() - s}")
+        print(f"Inserting took: {(time.perf_counter_ns() - s) / NS_PER_S}")
 
         validate_all_results(
             [0, 5, 10], range(0, 4), range(0, 3), index, queries, results
@@ -127,10 +205,10 @@ def test_search(subtests, data, queries, results):
 
     with subtests.test(msg="test_search [new data]"):
         # load persisted data
-        s = time.time()
+        s = time.perf_counter_ns()
         search = MiniSearch()
         _, index = search.add("wikipedia", MINISEARCH_DIR)
-        print(f"Loading took: {time.time() - s}\n\n")
+        print(f"Loading took: {(time.perf_counter_ns() - s) / NS_PER_S}\n\n")
 
         validate_all_results(
             [0, 5, 10], range(0, 4), range(0, 3), index, queries, results
@@ -147,7 +225,7 @@ def test_search_after_deletes(subtests, data, queries, results):
         _, index = search.add("wikipedia", MINISEARCH_DIR)
 
         to_delete = []
-        s = time.time()
+        s = time.perf_counter_ns()
         with index.session():
             for d in data:
                 index.add(d)
@@ -159,7 +237,7 @@ def test_search_after_deletes(subtests, data, queries, results):
             for _id in to_delete:
                 index.delete(_id)
 
-        print(f"Insert and delete took: {time.time() - s}\n\n")
+        print(f"Insert and delete took: {(time.perf_counter_ns() - s) / NS_PER_S}\n\n")
 
         validate_all_results(
             [0, 5, 10], range(0, 4), range(0, 3), index, queries, results
@@ -168,10 +246,10 @@ def test_search_after_deletes(subtests, data, queries, results):
     with subtests.test(msg="test_search_after_deletes [persisted data]"):
 
         # load persisted data
-        s = time.time()
+        s = time.perf_counter_ns()
         search = MiniSearch()
         _, index = search.add("wikipedia", MINISEARCH_DIR)
-        print(f"Loading took: {time.time() - s}\n\n")
+        print(f"Loading took: {(time.perf_counter_ns() - s) / NS_PER_S}\n\n")
 
         validate_all_results(
             [0, 5, 10], range(0, 4), range(0, 3), index, queries, results
@@ -188,7 +266,7 @@ def test_search_after_merge(subtests, data, queries, results):
             "wikipedia", MINISEARCH_DIR, "tests/assets/merge_test_conf.toml"
         )
 
-        s = time.time()
+        s = time.perf_counter_ns()
         to_delete = []
         with index.session():
             for d in data:
@@ -203,7 +281,7 @@ def test_search_after_merge(subtests, data, queries, results):
 
             index.merge()
 
-        print(f"Insert, delete and merge took: {time.time() - s}\n\n")
+        print(f"Insert, delete and merge took: {(time.perf_counter_ns() - s) / NS_PER_S}\n\n")
 
         validate_all_results(
             [0, 5, 10], range(0, 4), range(0, 3), index, queries, results
@@ -211,11 +289,91 @@ def test_search_after_merge(subtests, data, queries, results):
 
     with subtests.test(msg="test_search_after_merge [persisted data]"):
         # load persisted data
-        s = time.time()
+        s = time.perf_counter_ns()
         search = MiniSearch()
         _, index = search.add("wikipedia", MINISEARCH_DIR)
-        print(f"Loading took: {time.time() - s}\n\n")
+        print(f"Loading took: {(time.perf_counter_ns() - s) / NS_PER_S}\n\n")
 
         validate_all_results(
             [0, 5, 10], range(0, 4), range(0, 3), index, queries, results
         )
+
+
+def test_fuzzy_search_after_index_change():
+    search = MiniSearch()
+    _, index = search.add("wikipedia", MINISEARCH_DIR)
+
+    with index.session():
+        index.add("quick brown fox")
+        # fuzzy expansion of "brown" is cached by the first search
+        assert len(index.search("brown~1")) == 1
+
+        _id = index.add("lazy brawn dog")
+        assert len(index.search("brown~1")) == 2
+
+        index.delete(_id)
+        assert len(index.search("brown~1")) == 1
+
+
+def test_fuzzy_search_after_flushed_delete():
+    search = MiniSearch()
+    _, index = search.add("wikipedia", MINISEARCH_DIR)
+
+    with index.session():
+        _id = index.add("quick brown fox")
+        deleted_id = index.add("lazy brawn dog")
+
+    assert len(index.search("brown~1")) == 2
+
+    # flush force deletes buffered documents, so "brawn" is removed from fuzzy trie
+    index.delete(deleted_id)
+    index.flush()
+
+    assert [r.document.id for r in index.search("brown~1")] == [_id]
+    assert len(index.search("brawn")) == 0
+
+
+def test_add_many():
+    search = MiniSearch()
+    _, index = search.add("wikipedia", MINISEARCH_DIR)
+
+    documents = ["quick brown fox", "lazy brown dog"]
+    with index.session():
+        ids = index.add_many(documents)
+
+    assert [index.get(_id).content for _id in ids] == documents
+    assert [index.get(_id).content_prefix(5) for _id in ids] == [
+        d[:5] for d in documents
+    ]
+    assert len(index.search("brown")) == 2
+
+
+def test_search_stop_words_only():
+    search = MiniSearch()
+    _, index = search.add("wikipedia", MINISEARCH_DIR)
+
+    with index.session():
+        index.add("the quick brown fox")
+
+    # stop words are dropped by tokenizer, so there is nothing left to match
+    assert index.search("the") == []
+    assert index.search("the~1 of") == []
+    assert index.search_many(["the", "fox"])[0] == []
+
+
+def test_search_many():
+    search = MiniSearch()
+    _, index = search.add("wikipedia", MINISEARCH_DIR)
+
+    with index.session():
+        index.add("quick brown fox")
+        index.add("lazy brown dog")
+
+    queries = ["brown", "fox", "brown~1 cat"]
+    results = index.search_many(queries)
+
+    assert len(results) == len(queries)
+    for query, query_results in zip(queries, results):
+        assert [r.document.id for r in query_results] == [
+            r.document.id for r in index.search(query)
+        ]